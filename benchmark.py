@@ -0,0 +1,131 @@
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import poisson
+import poisson_analysis
+from main import parse_int_list, parse_shape_list
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = 'Benchmark PoissonGenerator throughput and pattern quality.')
+    parser.add_argument('--shapes', type = parse_shape_list, default = sorted(poisson.shapes), help = 'shapes to run, all by default')
+    parser.add_argument('--sizes', type = parse_int_list, default = [8, 64, 512], help = 'point counts, e.g. "8,64,512,4096,16384"')
+    parser.add_argument('--iterations', type = int, default = 1, help = 'restarts per find_point_set')
+    parser.add_argument('--iterations-per-point', type = int, default = 64, help = 'candidates tried per point')
+    parser.add_argument('--rotations', type = int, default = 4, help = 'rotations used by rotated_disk')
+    parser.add_argument('--candidate-pool', type = int, default = 0, help = 'persistent candidate pool size per point, 0 for best-candidate search')
+    parser.add_argument('--spatial-index', choices = sorted(poisson.spatial_indices) + ['auto'], default = 'auto')
+    parser.add_argument('--sorting-buckets', type = parse_int_list, default = [8])
+    parser.add_argument('--sorting-curve', choices = sorted(poisson.sort_curves), default = 'rows')
+    parser.add_argument('--repeat', type = int, default = 1, help = 'runs per measurement, the fastest is kept')
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--stats', action = 'store_true', help = 'add a GenerationStats report of one extra find_point_set run to its record')
+    parser.add_argument('--no-memory', dest = 'memory', action = 'store_false', help = 'skip the separate tracemalloc pass')
+    parser.add_argument('--output', help = 'write results as json')
+    parser.add_argument('--compare', nargs = 2, metavar = ('BASE', 'NEW'), help = 'compare two result files instead of running')
+    return parser.parse_args(argv)
+
+# revision of the checkout benchmark.py lives in, wherever it is run from
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr = subprocess.STDOUT,
+            cwd = os.path.dirname(os.path.abspath(__file__))).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(fun, repeat, memory):
+    seconds = np.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fun()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_bytes = None
+    if memory:
+        tracemalloc.start()
+        fun()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak_bytes
+
+def benchmark_shape(args, shape, num_points):
+    num_dim, disk, repeatPattern, allow_rotations = poisson.shapes[shape]
+    rotations = args.rotations if allow_rotations else 1
+    generator = poisson.PoissonGenerator(num_dim, disk, repeatPattern, disk, args.spatial_index, args.seed)
+
+    points, seconds, peak_bytes = measure(lambda: generator.find_point_set(num_points, args.iterations, args.iterations_per_point, rotations,
+        candidate_pool = args.candidate_pool), args.repeat, args.memory)
+    min_dist = float(generator.set_quality(points))
+    relative_min_dist = float(poisson_analysis.relative_min_dist(generator, min_dist, len(points)))
+    records = [('find_point_set', seconds, peak_bytes)]
+
+    permuted = generator.permute_points(points)
+    records.append(('find_next_point',) + measure(lambda: generator.find_next_point(permuted, args.iterations_per_point), args.repeat, args.memory)[1:])
+    records.append(('permute_point',) + measure(lambda: [generator.permute_point(point) for point in points], args.repeat, args.memory)[1:])
+    sorted_points, seconds, peak_bytes = measure(lambda: generator.cache_sort(points, args.sorting_buckets, args.sorting_curve), args.repeat, args.memory)
+    records.append(('cache_sort', seconds, peak_bytes))
+    records.append(('format_points_string',) + measure(lambda: generator.format_points_string(points), args.repeat, args.memory)[1:])
+
+    locality = generator.cache_locality(sorted_points)
+    results = [{'shape': shape, 'num_points': num_points, 'rotations': rotations, 'phase': phase, 'seconds': seconds,
+        'peak_bytes': peak_bytes, 'min_dist': min_dist, 'relative_min_dist': relative_min_dist, 'cache_hit_rate': locality['hit_rate'], 'mean_jump': locality['mean_jump']}
+        for phase, seconds, peak_bytes in records]
+    if args.stats:
+        # a separate run, so the timed ones above stay uninstrumented
+        stats = generator.set_stats(poisson.GenerationStats())
+        generator.find_point_set(num_points, args.iterations, args.iterations_per_point, rotations, candidate_pool = args.candidate_pool)
+        generator.set_stats(None)
+        results[0]['stats'] = stats.report()
+    return results
+
+def run(args):
+    # warm up lazy imports so they are not billed to the first measurement
+    poisson.PoissonGenerator(2, False, False, False).find_point_set(2, 1, 1, 1)
+    results = []
+    for shape in args.shapes:
+        for num_points in args.sizes:
+            records = benchmark_shape(args, shape, num_points)
+            for record in records:
+                print('%-14s %6d %-22s %10.6f s  %12s B  min dist %.6f (%.3f of densest packing)' % (shape, num_points, record['phase'],
+                    record['seconds'], record['peak_bytes'], record['min_dist'], record['relative_min_dist']))
+            results.extend(records)
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'options': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 1)
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    base_results = {(r['shape'], r['num_points'], r['phase']): r for r in base['results']}
+    print('%-14s %6s %-22s %10s %10s %8s %10s' % ('shape', 'points', 'phase', 'base s', 'new s', 'speedup', 'dist diff'))
+    for r in new['results']:
+        b = base_results.get((r['shape'], r['num_points'], r['phase']))
+        if b is None:
+            continue
+        speedup = b['seconds'] / r['seconds'] if r['seconds'] > 0 else np.inf
+        print('%-14s %6d %-22s %10.6f %10.6f %7.2fx %+10.6f' % (r['shape'], r['num_points'], r['phase'], b['seconds'], r['seconds'], speedup,
+            r['min_dist'] - b['min_dist']))
+
+def main(argv = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
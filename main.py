@@ -1,30 +1,162 @@
 from __future__ import print_function
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
 import numpy as np
-import math
-import matplotlib.pyplot as plt
 import poisson
+import poisson_export
+import poisson_sampling
+import poisson_service
 
-def main():
-    # user defined options
-    disk = False                # this parameter defines if we look for Poisson-like distribution on a disk/sphere (center at 0, radius 1) or in a square/box (0-1 on x and y)
-    repeatPattern = True        # this parameter defines if we look for "repeating" pattern so if we should maximize distances also with pattern repetitions
-    num_points = 8              # number of points we are looking for
-    num_iterations = 4          # number of iterations in which we take average minimum squared distances between points and try to maximize them
-    first_point_zero = disk     # should be first point zero (useful if we already have such sample) or random
-    iterations_per_point = 128  # iterations per point trying to look for a new point with larger distance
-    sorting_buckets = 0         # if this option is > 0, then sequence will be optimized for tiled cache locality in n x n tiles (x followed by y)
-    num_dim = 2                 # 1, 2, 3 dimensional version
-    num_rotations = 1           # number of rotations of pattern to check against
+def parse_int_list(spec):
+    # "8", "4,8,16" or inclusive ranges "4:256" / "4:256:4"
+    values = []
+    for part in spec.split(','):
+        bounds = [int(x) for x in part.split(':')]
+        if len(bounds) == 1:
+            values.append(bounds[0])
+        else:
+            step = bounds[2] if len(bounds) > 2 else 1
+            values.extend(range(bounds[0], bounds[1] + 1, step))
+    return values
 
+def parse_dim(spec):
+    num_dim = int(spec)
+    if num_dim < 1:
+        raise argparse.ArgumentTypeError('dimension must be 1 or more')
+    return num_dim
 
-    poisson_generator = poisson.PoissonGenerator(num_dim, disk, repeatPattern, first_point_zero)
-    points = poisson_generator.find_point_set(num_points, num_iterations, iterations_per_point, num_rotations)
-    points = poisson_generator.cache_sort(points, sorting_buckets)
-    print(poisson_generator.format_points_string(points))
+def parse_shape_list(spec):
+    names = [name.strip() for name in spec.split(',') if name.strip()]
+    for name in names:
+        if name not in poisson.shapes:
+            raise argparse.ArgumentTypeError("unknown shape '%s', expected one of %s" % (name, ', '.join(sorted(poisson.shapes))))
+    return names
 
-    fig = plt.figure(figsize=(10,10))
-    poisson_generator.generate_ui(fig, points)
-    plt.show()
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = 'Generate progressive Poisson-like sample patterns for hlsl and C++.')
+    parser.add_argument('--shape', choices = sorted(poisson.shapes), help = 'named pattern shape, overrides --dim, --disk and --repeat')
+    parser.add_argument('--dim', type = parse_dim, default = 2, help = 'number of dimensions, 1, 2, 3 or more (e.g. 4 for space x time)')
+    parser.add_argument('--disk', action = 'store_true', help = 'distribute on a disk/sphere/ball (center at 0, radius 1) instead of a square/box/hypercube (0-1)')
+    parser.add_argument('--no-repeat', dest = 'repeat', action = 'store_false', help = 'do not maximize distances with pattern repetitions')
+    parser.add_argument('--first-point-zero', dest = 'first_point_zero', action = 'store_true', default = None, help = 'first point is zero (default for disk/sphere)')
+    parser.add_argument('--first-point-random', dest = 'first_point_zero', action = 'store_false', help = 'first point is random (default for square/box)')
+    parser.add_argument('--points', type = int, default = 8, help = 'number of points we are looking for')
+    parser.add_argument('--iterations', type = int, default = 4, help = 'number of restarts, the one with the largest minimum distance is kept')
+    parser.add_argument('--iterations-per-point', type = int, default = 128, help = 'candidates tried per point looking for the largest distance')
+    parser.add_argument('--rotations', type = int, default = 1, help = 'number of rotations of disk pattern to check against')
+    parser.add_argument('--sorting-buckets', type = parse_int_list, default = [0],
+        help = 'if > 0, sort for tiled cache locality in n x n tiles, several counts ("4,32") sort tiles of tiles from coarse to fine')
+    parser.add_argument('--sorting-curve', choices = sorted(poisson.sort_curves), default = 'rows', help = 'order of the sorting buckets')
+    parser.add_argument('--candidate-pool', type = int, default = 0, help = 'if > 0, draw from a persistent pool of this many candidates per point')
+    parser.add_argument('--spatial-index', choices = sorted(poisson.spatial_indices) + ['auto'], default = 'auto',
+        help = 'nearest neighbour search used while generating, auto picks brute, grid or kdtree by dimension, periodicity and point count')
+    parser.add_argument('--candidate-stream', choices = sorted(poisson_sampling.streams), default = 'random', help = 'random or low discrepancy (r2, sobol) candidates')
+    parser.add_argument('--density', help = '.npy array of relative density over the pattern bounding box, axis 0 along x; spacing follows it')
+    parser.add_argument('--relax-iterations', type = int, default = 0, help = 'repulsion iterations applied to the best restart, a few replace many restarts')
+    parser.add_argument('--dart-radius', type = float, help = 'dart throwing: every point this far apart, as many as fit; ignores --points and the search options')
+    parser.add_argument('--progressive', action = 'store_true', help = 'reorder a dart throwing set so its prefixes are well spread')
+    parser.add_argument('--seed', type = int, help = 'seed for reproducible patterns')
+    parser.add_argument('--workers', type = int, default = 1, help = 'processes used for the restarts of a single pattern')
+    parser.add_argument('--service', type = poisson_service.parse_address,
+        help = 'fetch the pattern from a running poisson_service.py at this socket path or host:port instead of generating it')
+    parser.add_argument('--cache-dir', help = 'reuse results of seeded runs stored in this directory')
+    parser.add_argument('--sweep-points', type = parse_int_list, help = 'generate every point count, e.g. "4:256" or "8,16,32"')
+    parser.add_argument('--sweep-shapes', type = parse_shape_list, help = 'generate every shape, e.g. "disk,repeated_rect"')
+    parser.add_argument('--jobs', type = int, default = os.cpu_count() or 1, help = 'processes used for a sweep')
+    parser.add_argument('--output-dir', help = 'write every pattern to <output-dir>/<shape>_<points>.<ext> instead of stdout')
+    parser.add_argument('--format', choices = sorted(poisson_export.formats), default = 'text',
+        help = 'text: hlsl and C++ arrays, hex: C++ header with hex-float literals, raw32/raw16: little-endian float buffer, npy: numpy array')
+    parser.add_argument('--stats', action = 'store_true', help = 'print timings, distance evaluations and allocation sizes of every pattern to stderr as json')
+    parser.add_argument('--no-plot', dest = 'plot', action = 'store_false', help = 'do not show the pattern plot')
+    return parser.parse_args(argv)
+
+def shape_options(args, shape):
+    if shape is None:
+        return args.dim, args.disk, args.repeat, args.rotations
+    num_dim, disk, repeatPattern, allow_rotations = poisson.shapes[shape]
+    return num_dim, disk, repeatPattern, args.rotations if allow_rotations else 1
+
+def generate_pattern(args, shape, num_points):
+    num_dim, disk, repeatPattern, num_rotations = shape_options(args, shape)
+    first_point_zero = disk if args.first_point_zero is None else args.first_point_zero
+    poisson_generator = poisson.PoissonGenerator(num_dim, disk, repeatPattern, first_point_zero, args.spatial_index, args.seed)
+    if args.stats:
+        poisson_generator.set_stats(poisson.GenerationStats())
+    if args.candidate_stream != 'random' or args.density:
+        poisson_generator.set_sampler(args.candidate_stream, np.load(args.density) if args.density else None)
+    if args.dart_radius:
+        points = poisson_generator.dart_throwing(args.dart_radius, progressive = args.progressive)
+        points = poisson_generator.cache_sort(points, args.sorting_buckets, args.sorting_curve)
+    elif args.service:
+        if args.density:
+            raise SystemExit('--density is not supported with --service')
+        points = poisson_service.request_points(args.service, num_dim = num_dim, disk = disk, repeatPattern = repeatPattern,
+            first_point_zero = first_point_zero, num_points = num_points, num_iter = args.iterations, iterations_per_point = args.iterations_per_point,
+            rotations = num_rotations, sorting_buckets = args.sorting_buckets, sorting_curve = args.sorting_curve, candidate_pool = args.candidate_pool,
+            candidate_stream = args.candidate_stream, spatial_index = args.spatial_index, relax_iterations = args.relax_iterations, seed = args.seed)
+        poisson_generator.set_rotations(num_rotations)
+    elif args.cache_dir:
+        points = poisson_generator.find_point_set_cached(args.cache_dir, num_points, args.iterations, args.iterations_per_point, num_rotations,
+            args.sorting_buckets, candidate_pool = args.candidate_pool, workers = args.workers, sorting_curve = args.sorting_curve,
+            relax_iterations = args.relax_iterations)
+    else:
+        points = poisson_generator.find_point_set(num_points, args.iterations, args.iterations_per_point, num_rotations,
+            candidate_pool = args.candidate_pool, workers = args.workers, relax_iterations = args.relax_iterations)
+        points = poisson_generator.cache_sort(points, args.sorting_buckets, args.sorting_curve)
+    if args.stats:
+        report = dict(shape = shape, num_points = len(points), **poisson_generator.stats.report())
+        print(json.dumps(report), file = sys.stderr)
+    return poisson_generator, points
+
+def write_outputs(args, outputs):
+    outputs = list(outputs)
+    extension, binary, writer = poisson_export.formats[args.format]
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+    if not args.output_dir and binary and len(outputs) > 1:
+        raise SystemExit('binary formats need --output-dir for more than one pattern')
+    for (shape, num_points), points in outputs:
+        name = '%s_%d' % (shape or 'pattern', num_points)
+        if args.output_dir:
+            writer(points, os.path.join(args.output_dir, name + extension))
+        elif binary:
+            writer(points, sys.stdout.buffer)
+        else:
+            if len(outputs) > 1:
+                print('// ' + name)
+            writer(points, sys.stdout)
+            print()
+
+def generate_points(args, shape, num_points):
+    return generate_pattern(args, shape, num_points)[1]
+
+def run_sweep(args):
+    jobs = [(shape, num_points) for shape in (args.sweep_shapes or [args.shape]) for num_points in (args.sweep_points or [args.points])]
+    if args.jobs > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = args.jobs) as executor:
+            results = list(executor.map(generate_points, [args] * len(jobs), *zip(*jobs)))
+    else:
+        results = [generate_points(args, shape, num_points) for shape, num_points in jobs]
+    write_outputs(args, zip(jobs, results))
+
+def main(argv = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.sweep_points or args.sweep_shapes:
+        run_sweep(args)
+        return
+
+    poisson_generator, points = generate_pattern(args, args.shape, args.points)
+    write_outputs(args, [((args.shape, len(points)), points)])
+
+    if args.plot and poisson_generator.num_dim <= 3:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(10,10))
+        poisson_generator.generate_ui(fig, points)
+        plt.show()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 import sys
+import time
 from poisson_ui import Ui_MainWindow
 import poisson
+import poisson_plot
 
 from matplotlib.backends import qt_compat
 use_pyside = qt_compat.QT_API == qt_compat.QT_API_PYSIDE2
@@ -33,14 +35,18 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.task = TaskThread()
         self.task.taskFinished.connect(self.onFinished)
         self.task.notifyProgress.connect(self.onProgress)
+        self.task.notifyPoints.connect(self.onPoints)
         self.taskStarted = False
 
         self.ui.highlightFirstSlider.valueChanged.connect(self.redrawFigure)
 
         self.points = None
+        self.plot = None
 
     def generate(self):
+        # pressing generate again stops the running task early and keeps its best set so far
         if self.taskStarted == True:
+            self.task.requestInterruption()
             return
 
         self.taskStarted = True
@@ -104,6 +110,13 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.task.iterations_per_point = iterations_per_point
         self.task.sorting_buckets = sorting_buckets
         self.task.rotations = rotations
+
+        # one plot per generation, partial sets and slider moves only update its points
+        poisson_generator.set_rotations(rotations)
+        self.points = None
+        self.ui.figure.clear()
+        self.plot = poisson_plot.PointSetPlot(poisson_generator, self.ui.figure)
+        self.ui.plot_canvas.draw_idle()
         self.task.start()
 
     def onFinished(self):
@@ -119,10 +132,11 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 
     def redrawFigure(self):
         if not self.points is None:
-            self.ui.figure.clear()
-            self.task.poisson_generator.generate_ui(self.ui.figure, self.points, self.ui.highlightFirstSlider.value())
-            self.ui.plot_canvas.updateGeometry()
-            self.ui.plot_canvas.draw()
+            self.plot.update(self.points, self.ui.highlightFirstSlider.value())
+
+    def onPoints(self, points):
+        if self.taskStarted and points is not None:
+            self.plot.update(points, self.ui.highlightFirstSlider.value())
 
     def onProgress(self, i):
         self.ui.progressBar.setValue(int(round(i * 1024)))
@@ -136,8 +150,19 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 class TaskThread(QtCore.QThread):
     taskFinished = QtCore.pyqtSignal()
     notifyProgress = QtCore.pyqtSignal(float)
+    notifyPoints = QtCore.pyqtSignal(object)
+    # partial sets are sent at most this often, drawing is slower than generating
+    points_interval = 0.2
+
     def run(self):
-        self.points = self.poisson_generator.find_point_set(self.num_points, self.num_iterations, self.iterations_per_point, self.rotations, self.progress_fun)
+        last_sent = 0.0
+        for state in self.poisson_generator.iter_point_set(self.num_points, self.num_iterations, self.iterations_per_point, self.rotations,
+                yield_every = max(1, self.num_points // 64), cancel = self.isInterruptionRequested):
+            self.progress_fun(state.progress)
+            if not state.finished and time.time() - last_sent > self.points_interval:
+                self.notifyPoints.emit(state.points)
+                last_sent = time.time()
+        self.points = state.points
         self.taskFinished.emit() 
 
     def progress_fun(self, val):
@@ -1,264 +1,1284 @@
 from __future__ import division
 import numpy as np
 import math
-import scipy.spatial.distance
-from mpl_toolkits.mplot3d import Axes3D
+import os
+import hashlib
+import numbers
+import collections
+import contextlib
+import functools
+import io
+import time
+import concurrent.futures
+import poisson_export
+import poisson_sampling
 
-def random_point_disk(num_points = 1):
-    alpha = np.random.random(num_points) * math.pi * 2.0
-    radius = np.sqrt(np.random.random(num_points))
+def random_point_disk(num_points = 1, rng = np.random):
+    alpha = rng.random(num_points) * math.pi * 2.0
+    radius = np.sqrt(rng.random(num_points))
     x = np.cos(alpha) * radius
     y = np.sin(alpha) * radius
     return np.dstack((x,y))[0]
 
-def random_point_sphere(num_points = 1):
-    theta = np.random.random(num_points) * math.pi * 2.0
-    phi = np.arccos(2.0 * np.random.random(num_points) - 1.0)
-    radius = pow(np.random.random(num_points), 1.0 / 3.0)
-    x = np.cos(theta) * np.sin(phi) * radius
-    y = np.sin(theta) * np.sin(phi) * radius
-    z = np.cos(phi) * radius
-    return np.dstack((x,y,z))[0]
+# rejection from the bounding cube, no transcendental calls and about 1.9 cube points per accepted one
+def random_point_sphere(num_points = 1, rng = np.random):
+    points = np.empty((num_points, 3))
+    num_accepted = 0
+    while num_accepted < num_points:
+        candidates = rng.random((2 * (num_points - num_accepted) + 8, 3)) * 2.0 - 1.0
+        candidates = candidates[np.einsum('ij,ij->i', candidates, candidates) < 1.0][:num_points - num_accepted]
+        points[num_accepted:num_accepted + len(candidates)] = candidates
+        num_accepted += len(candidates)
+    return points
 
-def random_point_line(num_points = 1):
-    x = np.random.random(num_points)
+def random_point_line(num_points = 1, rng = np.random):
+    x = rng.random(num_points)
     return np.reshape(x, (num_points,1))
 
-def random_point_square(num_points = 1):
-    x = np.random.random(num_points)
-    y = np.random.random(num_points)
+def random_point_square(num_points = 1, rng = np.random):
+    x = rng.random(num_points)
+    y = rng.random(num_points)
     return np.dstack((x,y))[0]
 
-def random_point_box(num_points = 1):
-    x = np.random.random(num_points)
-    y = np.random.random(num_points)
-    z = np.random.random(num_points)
+def random_point_box(num_points = 1, rng = np.random):
+    x = rng.random(num_points)
+    y = rng.random(num_points)
+    z = rng.random(num_points)
     return np.dstack((x,y,z))[0]
 
+# any dimension: the unit hypercube [0, 1)^num_dim
+def random_point_cube(num_points = 1, rng = np.random, num_dim = 4):
+    return rng.random((num_points, num_dim))
+
+# any dimension: the unit ball as gaussian directions scaled by u^(1/num_dim). Rejection from the cube would keep only
+# pi^2/32 of the candidates in 4D and less than 1% from 8D on.
+def random_point_ball(num_points = 1, rng = np.random, num_dim = 4):
+    directions = rng.standard_normal((num_points, num_dim))
+    norms = np.maximum(np.sqrt(np.einsum('ij,ij->i', directions, directions)), 1e-300)
+    return directions * (rng.random(num_points) ** (1.0 / num_dim) / norms)[:, np.newaxis]
+
+# integer offsets of the (2 reach + 1)^num_dim lattice neighbourhood, first axis varying fastest
+def lattice_offsets(num_dim, reach = 1):
+    return np.indices((2 * reach + 1,) * num_dim).reshape(num_dim, -1).T[:, ::-1] - reach
+
 # if we only compare it doesn't matter if it's squared
 def min_dist_squared(points, point):
     diff = points - np.array([point])
     return np.min(np.einsum('ij,ij->i',diff,diff))
 
+# candidates are scored against point blocks so the temporary distance matrix stays below this many elements
+max_block_elements = 1 << 20
+
+# |c - p|^2 expanded as |c|^2 + |p|^2 - 2 c.p, so every block is a single matrix product
+def min_dist_squared_batch(points, candidates, block_elements = None):
+    if block_elements is None:
+        block_elements = max_block_elements
+    block_size = max(1, block_elements // len(candidates))
+    candidates_sq = np.einsum('ij,ij->i', candidates, candidates)
+    best_dist = np.full(len(candidates), np.inf)
+    for start in range(0, len(points), block_size):
+        block = points[start:start + block_size]
+        dist = np.einsum('ij,ij->i', block, block) - 2.0 * np.dot(candidates, block.T)
+        np.minimum(best_dist, np.min(dist, axis = 1), out = best_dist)
+    return np.maximum(best_dist + candidates_sq, 0.0)
+
+# nearest squared distance on the unit torus (minimum image), used instead of explicit periodic copies
+def min_dist_squared_periodic(points, candidates):
+    best_dist = np.full(len(candidates), np.inf)
+    block_size = max(1, max_block_elements // (len(candidates) * candidates.shape[1]))
+    for start in range(0, len(points), block_size):
+        diff = candidates[:, np.newaxis, :] - points[np.newaxis, start:start + block_size, :]
+        diff -= np.round(diff)
+        np.minimum(best_dist, np.min(np.einsum('ijk,ijk->ij', diff, diff), axis = 1), out = best_dist)
+    return best_dist
+
+# copies of 2D points rotated by every multiple of 2 pi / rotations, the original points first
+def rotated_copies(points, rotations):
+    angles = np.arange(rotations) * math.pi * 2.0 / rotations
+    c, s = np.cos(angles)[:, np.newaxis], np.sin(angles)[:, np.newaxis]
+    x, y = points[:, 0], points[:, 1]
+    return np.stack((c * x - s * y, s * x + c * y), axis = -1).reshape(-1, 2)
+
+def polar(points):
+    return np.hypot(points[:, 0], points[:, 1]), np.arctan2(points[:, 1], points[:, 0])
+
+# squared distances between candidates and the closest rotated copy of every point, from polar coordinates: the closest
+# rotation only depends on the angle difference modulo 2 pi / rotations, so a pair costs the same for any rotation count
+def rotated_dist_squared(candidates_polar, points_polar, rotations):
+    sector = math.pi * 2.0 / rotations
+    candidates_radius, candidates_angle = candidates_polar[0][:, np.newaxis], candidates_polar[1][:, np.newaxis]
+    radius, angle = points_polar
+    delta = np.mod(candidates_angle - angle, sector)
+    delta = np.minimum(delta, sector - delta)
+    return np.maximum(candidates_radius ** 2 + radius ** 2 - 2.0 * candidates_radius * radius * np.cos(delta), 0.0)
+
+def min_dist_squared_rotated(points, candidates, rotations):
+    radius, angle = polar(points)
+    candidates_polar = polar(candidates)
+    best_dist = np.full(len(candidates), np.inf)
+    block_size = max(1, max_block_elements // len(candidates))
+    for start in range(0, len(points), block_size):
+        block = slice(start, start + block_size)
+        np.minimum(best_dist, np.min(rotated_dist_squared(candidates_polar, (radius[block], angle[block]), rotations), axis = 1), out = best_dist)
+    return best_dist
+
+# squared distance from each point to its own nearest rotated copy, points at the center coincide with their copies
+def self_rotation_dist_squared(points, rotations):
+    radius_squared = np.einsum('ij,ij->i', points, points)
+    return np.where(radius_squared > 0.0, 4.0 * radius_squared * math.sin(math.pi / rotations) ** 2, np.inf)
+
+# nearest neighbour distance of every point, yielded in blocks of rows so memory stays bounded for any set size.
+# Periodic patterns wrap through the kd-tree boxsize and rotated ones include every rotated copy, which matches
+# the nearest distance among all explicit copies without building them.
+def iter_nearest_dist(points, periodic = False, rotations = 1, block_size = 8192):
+    if rotations > 1:
+        radius, angle = polar(points)
+        self_dist = self_rotation_dist_squared(points, rotations)
+        block_size = max(1, min(block_size, max_block_elements // len(points)))
+        for start in range(0, len(points), block_size):
+            block = slice(start, start + block_size)
+            dist = rotated_dist_squared((radius[block], angle[block]), (radius, angle), rotations)
+            rows = np.arange(dist.shape[0])
+            dist[rows, start + rows] = np.inf
+            yield np.sqrt(np.minimum(np.min(dist, axis = 1), self_dist[block]))
+        return
+
+    import scipy.spatial
+    if periodic:
+        points = np.mod(points, 1.0)
+        points[points >= 1.0] = 0.0
+        tree = scipy.spatial.cKDTree(points, boxsize = 1.0)
+    else:
+        tree = scipy.spatial.cKDTree(points)
+    for start in range(0, len(points), block_size):
+        yield tree.query(points[start:start + block_size], k = 2)[0][:, 1]
+
+def nearest_dist(points, periodic = False, rotations = 1):
+    if len(points) < 2 and rotations < 2:
+        return np.full(len(points), np.inf)
+    return np.concatenate(list(iter_nearest_dist(points, periodic, rotations)))
+
+# minimum pairwise distance of a set. Evaluation stops once the running minimum drops to stop_below,
+# the result is then only an upper bound, which is enough to reject a restart that cannot beat the best one.
+def min_pairwise_dist(points, periodic = False, rotations = 1, stop_below = None):
+    best_dist = np.inf
+    if len(points) < 2 and rotations < 2:
+        return best_dist
+    for dist in iter_nearest_dist(points, periodic, rotations):
+        best_dist = min(best_dist, np.min(dist))
+        if stop_below is not None and best_dist <= stop_below:
+            break
+    return best_dist
+
+# distance from every point to its nearest predecessor in the sequence and that predecessor's index, inf for the first
+# point. The running minimum of it is the quality of every prefix. Computed exactly in doubling blocks: a kd-tree of
+# all earlier blocks, then the nearest neighbours inside the block, k at a time until an earlier one is found or the
+# k-th is no closer than the earlier blocks.
+def nearest_earlier(points, periodic = False):
+    import scipy.spatial
+    boxsize = 1.0 if periodic else None
+    num_points = len(points)
+    dist = np.full(num_points, np.inf)
+    index = np.zeros(num_points, dtype = np.int64)
+    start = 1
+    while start < num_points:
+        end = min(2 * start, num_points)
+        block = points[start:end]
+        dist[start:end], index[start:end] = scipy.spatial.cKDTree(points[:start], boxsize = boxsize).query(block)
+        block_tree = scipy.spatial.cKDTree(block, boxsize = boxsize)
+        unresolved = np.arange(end - start)
+        k = min(8, end - start)
+        while len(unresolved):
+            block_dist, block_index = block_tree.query(block[unresolved], k = list(range(1, k + 1)))
+            earlier = block_index < unresolved[:, np.newaxis]
+            found = np.any(earlier, axis = 1)
+            nearest = np.argmax(earlier, axis = 1)
+            rows = np.arange(len(unresolved))
+            closer = found & (block_dist[rows, nearest] < dist[start + unresolved])
+            dist[start + unresolved[closer]] = block_dist[rows, nearest][closer]
+            index[start + unresolved[closer]] = start + block_index[rows, nearest][closer]
+            resolved = found | (block_dist[:, -1] >= dist[start + unresolved]) | (k == end - start)
+            unresolved = unresolved[~resolved]
+            k = min(2 * k, end - start)
+        start = end
+    return dist, index
+
+# rotated disk: accepted points are kept in polar form and candidates are scored against every rotation of them
+class RotationIndex:
+    def __init__(self, generator, capacity):
+        self.rotations = generator.rotations
+        self.inserted_points = np.zeros((capacity, 2))
+        self.num_points = 0
+        self.evaluations = 0
+
+    def insert(self, point):
+        self.inserted_points[self.num_points] = point
+        self.num_points += 1
+
+    def min_dist_squared(self, candidates):
+        self.evaluations += len(candidates) * (self.num_points + 1)
+        dist = min_dist_squared_rotated(self.inserted_points[:self.num_points], candidates, self.rotations)
+        return np.minimum(dist, self_rotation_dist_squared(candidates, self.rotations))
+
+    def points(self):
+        return self.inserted_points[:self.num_points]
+
+    def nbytes(self):
+        return self.inserted_points.nbytes
+
+# spatial indices used by generate_points, all share insert / min_dist_squared / points / nbytes and count the point to
+# candidate distances they compute in evaluations
+
+# brute force scan over every accepted point including its periodic copies
+class PermutedPointIndex:
+    def __init__(self, generator, capacity):
+        self.generator = generator
+        self.permuted_points = np.zeros((capacity * generator.num_perms, generator.num_dim))
+        self.num_permuted = 0
+        self.evaluations = 0
+
+    def insert(self, point):
+        num_perms = self.generator.num_perms
+        if self.num_permuted + num_perms > len(self.permuted_points):
+            self.permuted_points = np.concatenate((self.permuted_points, np.zeros(self.permuted_points.shape)))
+        self.permuted_points[self.num_permuted:self.num_permuted + num_perms] = point + self.generator.perm_offsets
+        self.num_permuted += num_perms
+
+    def min_dist_squared(self, candidates):
+        self.evaluations += len(candidates) * self.num_permuted
+        return min_dist_squared_batch(self.permuted_points[:self.num_permuted], candidates)
+
+    def points(self):
+        return self.permuted_points[:self.num_permuted:self.generator.num_perms]
+
+    def nbytes(self):
+        return self.permuted_points.nbytes
+
+# uniform grid resized to the expected point spacing as points are inserted, periodic patterns wrap natively
+class GridIndex:
+    def __init__(self, generator, capacity, points_per_cell = 2):
+        self.num_dim = generator.num_dim
+        self.periodic = generator.repeatPattern
+        self.lower_bound = generator.lower_bound
+        self.upper_bound = generator.upper_bound
+        self.points_per_cell = points_per_cell
+        self.inserted_points = np.zeros((capacity, self.num_dim))
+        self.num_points = 0
+        self.evaluations = 0
+        self.stencil = lattice_offsets(self.num_dim)
+        self.build(1)
+
+    def build(self, grid_size):
+        self.grid_size = grid_size
+        self.cell_size = (self.upper_bound - self.lower_bound) / grid_size
+        self.cell_strides = grid_size ** np.arange(self.num_dim - 1, -1, -1)
+        self.cell_counts = np.zeros(grid_size ** self.num_dim, dtype = int)
+        # empty slots are nan so they survive the periodic wrap and are skipped by fmin
+        self.cell_points = np.full((grid_size ** self.num_dim, self.points_per_cell * 2, self.num_dim), np.nan)
+        for point in self.inserted_points[:self.num_points]:
+            self.add_to_cell(point)
+
+    def cell_coords(self, points):
+        return np.clip(np.floor((points - self.lower_bound) / self.cell_size).astype(int), 0, self.grid_size - 1)
+
+    def add_to_cell(self, point):
+        cell = np.dot(self.cell_coords(point), self.cell_strides)
+        if self.cell_counts[cell] == self.cell_points.shape[1]:
+            self.cell_points = np.concatenate((self.cell_points, np.full(self.cell_points.shape, np.nan)), axis = 1)
+        self.cell_points[cell, self.cell_counts[cell]] = point
+        self.cell_counts[cell] += 1
+
+    def insert(self, point):
+        self.inserted_points[self.num_points] = point
+        self.num_points += 1
+        grid_size = max(1, int((self.num_points / self.points_per_cell) ** (1.0 / self.num_dim)))
+        if grid_size >= 2 * self.grid_size:
+            self.build(grid_size)
+        else:
+            self.add_to_cell(point)
+
+    def min_dist_squared(self, candidates):
+        neighbour_cells = self.cell_coords(candidates)[:, np.newaxis, :] + self.stencil
+        if self.periodic:
+            neighbour_cells %= self.grid_size
+        else:
+            neighbour_cells = np.clip(neighbour_cells, 0, self.grid_size - 1)
+        neighbours = self.cell_points[np.dot(neighbour_cells, self.cell_strides)]
+        self.evaluations += neighbours.shape[0] * neighbours.shape[1] * neighbours.shape[2]
+        diff = neighbours - candidates[:, np.newaxis, np.newaxis, :]
+        if self.periodic:
+            diff -= np.round(diff)
+        dist = np.fmin.reduce(np.einsum('ijkl,ijkl->ijk', diff, diff), axis = (1, 2))
+        # anything beyond the 3^d stencil is at least one cell away, farther candidates need a full scan
+        far = ~(dist <= self.cell_size ** 2)
+        if np.any(far):
+            points = self.inserted_points[:self.num_points]
+            self.evaluations += np.count_nonzero(far) * self.num_points
+            if self.periodic:
+                dist[far] = min_dist_squared_periodic(points, candidates[far])
+            else:
+                dist[far] = min_dist_squared_batch(points, candidates[far])
+        return dist
+
+    def points(self):
+        return self.inserted_points[:self.num_points]
+
+    def nbytes(self):
+        return self.inserted_points.nbytes + self.cell_points.nbytes + self.cell_counts.nbytes
+
+# scipy kd-tree rebuilt in batches, points inserted since the last rebuild are scanned directly. A tree query counts as
+# one evaluation, scipy does not report how many points it visits.
+class KDTreeIndex:
+    def __init__(self, generator, capacity, min_rebuild_batch = 64):
+        self.periodic = generator.repeatPattern
+        self.min_rebuild_batch = min_rebuild_batch
+        self.inserted_points = np.zeros((capacity, generator.num_dim))
+        self.num_points = 0
+        self.num_tree_points = 0
+        self.tree = None
+        self.evaluations = 0
+
+    def insert(self, point):
+        import scipy.spatial
+        self.inserted_points[self.num_points] = point
+        self.num_points += 1
+        if self.num_points - self.num_tree_points >= max(self.min_rebuild_batch, self.num_tree_points // 2):
+            tree_points = self.inserted_points[:self.num_points]
+            if self.periodic:
+                self.tree = scipy.spatial.cKDTree(np.mod(tree_points, 1.0), boxsize = 1.0)
+            else:
+                self.tree = scipy.spatial.cKDTree(tree_points)
+            self.num_tree_points = self.num_points
+
+    def min_dist_squared(self, candidates):
+        pending = self.inserted_points[self.num_tree_points:self.num_points]
+        self.evaluations += len(candidates) * (len(pending) + (self.tree is not None))
+        if self.periodic:
+            dist = min_dist_squared_periodic(pending, candidates)
+        else:
+            dist = min_dist_squared_batch(pending, candidates)
+        if self.tree is not None:
+            tree_dist = self.tree.query(np.mod(candidates, 1.0) if self.periodic else candidates)[0]
+            np.minimum(dist, tree_dist ** 2, out = dist)
+        return dist
+
+    def points(self):
+        return self.inserted_points[:self.num_points]
+
+    def nbytes(self):
+        # cKDTree keeps a copy of its points plus about as much again for its nodes
+        return self.inserted_points.nbytes + 2 * self.num_tree_points * self.inserted_points.shape[1] * 8
+
+# bump whenever generation changes so stale cached results are not reused
+cache_version = 5
+
+spatial_indices = {'brute': PermutedPointIndex, 'grid': GridIndex, 'kdtree': KDTreeIndex}
+
+# 'auto' uses the kd-tree above 3D, where the 3^num_dim periodic copies of the scan and the 3^num_dim cell stencil of the
+# grid grow too fast. Up to 3D the brute force scan wins for small and non-periodic sets, while the grid wins for larger
+# periodic ones, where the scan covers every periodic copy. All of them give identical points
+auto_grid_points = 256
+
+def auto_spatial_index(num_dim, repeatPattern, num_points):
+    if num_dim > 3:
+        return 'kdtree'
+    return 'grid' if repeatPattern and num_points >= auto_grid_points else 'brute'
+
+# persistent best-candidate pool: every candidate caches its squared distance to the nearest accepted point,
+# candidates are bucketed in a uniform grid so accepting a point only revisits cells it can still influence
+class CandidatePool:
+    # weights scale every candidate's squared distances, e.g. by density
+    def __init__(self, candidates, lower_bound, upper_bound, periodic, candidates_per_cell = 4, initial_dist = None, weights = None):
+        num_candidates, self.num_dim = candidates.shape
+        self.periodic = periodic
+        self.lower_bound = lower_bound
+        self.grid_size = max(1, int((num_candidates / candidates_per_cell) ** (1.0 / self.num_dim)))
+        self.cell_size = (upper_bound - lower_bound) / self.grid_size
+        self.cell_strides = self.grid_size ** np.arange(self.num_dim - 1, -1, -1)
+        cell_ids = np.dot(self.cell_coords(candidates), self.cell_strides)
+        order = np.argsort(cell_ids, kind = 'stable')
+        self.candidates = candidates[order]
+        self.cell_start = np.searchsorted(cell_ids[order], np.arange(self.grid_size ** self.num_dim + 1))
+        self.dist = np.full(num_candidates, np.inf) if initial_dist is None else initial_dist[order]
+        self.weights = None if weights is None else weights[order]
+        self.min_weight = 1.0 if weights is None else np.min(weights)
+        self.evaluations = 0
+        # empty cells never win the argmax
+        self.cell_max = np.full(len(self.cell_start) - 1, -1.0)
+        occupied = np.flatnonzero(np.diff(self.cell_start) > 0)
+        self.cell_max[occupied] = np.maximum.reduceat(self.dist, self.cell_start[occupied])
+
+    def cell_coords(self, points):
+        return np.clip(np.floor((points - self.lower_bound) / self.cell_size).astype(int), 0, self.grid_size - 1)
+
+    def best(self):
+        cell = np.argmax(self.cell_max)
+        start, end = self.cell_start[cell], self.cell_start[cell + 1]
+        return self.candidates[start + np.argmax(self.dist[start:end])]
+
+    def nbytes(self):
+        return self.candidates.nbytes + self.dist.nbytes + self.cell_max.nbytes + self.cell_start.nbytes
+
+    def cells_around(self, point, radius):
+        axis_cells = []
+        for axis in range(self.num_dim):
+            if 2.0 * radius >= self.grid_size * self.cell_size:
+                cells = np.arange(self.grid_size)
+            else:
+                low = int(math.floor((point[axis] - radius - self.lower_bound) / self.cell_size))
+                high = int(math.floor((point[axis] + radius - self.lower_bound) / self.cell_size))
+                if self.periodic:
+                    cells = np.arange(low, high + 1) % self.grid_size
+                else:
+                    cells = np.arange(max(low, 0), min(high, self.grid_size - 1) + 1)
+            axis_cells.append(cells * self.cell_strides[axis])
+        return sum(np.ix_(*axis_cells)).ravel()
+
+    def insert(self, point):
+        # only candidates closer than the current largest cached distance can change
+        radius = math.sqrt(np.max(self.cell_max) / self.min_weight)
+        cells = self.cells_around(point, radius)
+        counts = self.cell_start[cells + 1] - self.cell_start[cells]
+        cells, counts = cells[counts > 0], counts[counts > 0]
+        if len(cells) == 0:
+            return
+        segment_start = np.cumsum(counts) - counts
+        indices = np.repeat(self.cell_start[cells] - segment_start, counts) + np.arange(np.sum(counts))
+        self.evaluations += len(indices)
+        diff = self.candidates[indices] - point
+        if self.periodic:
+            diff -= np.round(diff)
+        dist = np.einsum('ij,ij->i', diff, diff)
+        if self.weights is not None:
+            dist *= self.weights[indices]
+        dist = np.minimum(self.dist[indices], dist)
+        self.dist[indices] = dist
+        self.cell_max[cells] = np.maximum.reduceat(dist, segment_start)
+
+# keys for cache_sort, cells are (N, num_dim) integer cell coordinates in [0, buckets)
+
+def check_key_bits(bits):
+    if bits > 63:
+        raise ValueError('sorting keys need %d bits, more than 63: use fewer sorting buckets in this dimension' % math.ceil(bits))
+
+def curve_bits(buckets):
+    return max(1, int(buckets - 1).bit_length())
+
+# row-major with y from the top down, as the sample tables have always been ordered
+def rows_key(cells, buckets):
+    check_key_bits(cells.shape[1] * math.log2(max(buckets, 1)))
+    cells = cells.copy()
+    if cells.shape[1] > 1:
+        cells[:, 1] = buckets - 1 - cells[:, 1]
+    return np.dot(cells, buckets ** np.arange(cells.shape[1], dtype = np.int64))
+
+# interleaves bit b of every axis, the last axis most significant, highest bits first
+def interleave_bits(cells, bits):
+    check_key_bits(bits * cells.shape[1])
+    key = np.zeros(len(cells), dtype = np.int64)
+    for bit in range(bits - 1, -1, -1):
+        for axis in range(cells.shape[1] - 1, -1, -1):
+            key = (key << 1) | ((cells[:, axis] >> bit) & 1)
+    return key
+
+def morton_key(cells, buckets):
+    return interleave_bits(cells, curve_bits(buckets))
+
+# Skilling's transform ("Programming the Hilbert curve", 2004) on all points at once
+def hilbert_key(cells, buckets):
+    bits = curve_bits(buckets)
+    x = cells[:, ::-1].copy()
+    num_dim = x.shape[1]
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = q - 1
+        for i in range(num_dim):
+            high = (x[:, i] & q) != 0
+            x[high, 0] ^= p
+            t = (x[~high, 0] ^ x[~high, i]) & p
+            x[~high, 0] ^= t
+            x[~high, i] ^= t
+        q >>= 1
+    for i in range(1, num_dim):
+        x[:, i] ^= x[:, i - 1]
+    t = np.zeros(len(x), dtype = np.int64)
+    q = 1 << (bits - 1)
+    while q > 1:
+        t[(x[:, num_dim - 1] & q) != 0] ^= q - 1
+        q >>= 1
+    x ^= t[:, np.newaxis]
+    return interleave_bits(x[:, ::-1], bits)
+
+sort_curves = {'rows': rows_key, 'morton': morton_key, 'hilbert': hilbert_key}
+
+# snapshot streamed by PoissonGenerator.iter_point_set, quality is the minimum distance of points
+GenerationState = collections.namedtuple('GenerationState', ['points', 'quality', 'num_restarts_done', 'num_restarts', 'num_accepted', 'progress', 'elapsed', 'finished'])
+
+# opt-in instrumentation installed with PoissonGenerator.set_stats, the hot paths only check for None without it.
+# phases maps a phase name to [calls, seconds, peak_bytes], nested phases are also billed to their parents. counters holds
+# candidates, distance_evaluations, accepted_points, restarts, restarts_improved, darts and darts_accepted, and
+# restart_quality the quality of every finished restart in seed order. callback(name, stats) runs when an outermost phase
+# (find_point_set, find_point_sets, dart_throwing, relax or cache_sort called directly) ends.
+class GenerationStats:
+    def __init__(self, callback = None):
+        self.callback = callback
+        self.phases = {}
+        self.counters = collections.Counter()
+        self.restart_quality = []
+        self.depth = 0
+
+    # the callback stays in the parent process when generators are sent to workers
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['callback'] = None
+        return state
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            self.depth -= 1
+            if self.depth == 0 and self.callback is not None:
+                self.callback(name, self)
+
+    def add_time(self, name, seconds, calls = 1):
+        phase = self.phases.setdefault(name, [0, 0.0, 0])
+        phase[0] += calls
+        phase[1] += seconds
+
+    # size of the largest array set up by one call of a phase
+    def allocate(self, name, nbytes):
+        phase = self.phases.setdefault(name, [0, 0.0, 0])
+        phase[2] = max(phase[2], int(nbytes))
+
+    def count(self, name, amount = 1):
+        self.counters[name] += int(amount)
+
+    def record_restart(self, num_points, quality):
+        self.count('restarts')
+        self.count('accepted_points', num_points)
+        if not self.restart_quality or quality > max(self.restart_quality):
+            self.count('restarts_improved')
+        self.restart_quality.append(float(quality))
+
+    def merge(self, other):
+        for name, (calls, seconds, peak_bytes) in other.phases.items():
+            self.add_time(name, seconds, calls)
+            self.allocate(name, peak_bytes)
+        self.counters.update(other.counters)
+        self.restart_quality.extend(other.restart_quality)
+
+    def reset(self):
+        self.phases = {}
+        self.counters = collections.Counter()
+        self.restart_quality = []
+
+    # plain dict for json: per phase calls, seconds, mean_seconds and peak_bytes, the counters, restart_quality and the
+    # derived acceptance_rate (accepted points per candidate) and evaluations_per_second of find_next_point
+    def report(self):
+        phases = {name: {'calls': calls, 'seconds': seconds, 'mean_seconds': seconds / calls if calls else 0.0, 'peak_bytes': peak_bytes}
+            for name, (calls, seconds, peak_bytes) in self.phases.items()}
+        report = {'phases': phases, 'counters': dict(self.counters), 'restart_quality': list(self.restart_quality)}
+        if self.counters['candidates'] > 0:
+            report['acceptance_rate'] = self.counters['accepted_points'] / self.counters['candidates']
+        if self.counters['darts'] > 0:
+            report['dart_acceptance_rate'] = self.counters['darts_accepted'] / self.counters['darts']
+        search = phases.get('find_next_point')
+        if search is not None and search['seconds'] > 0.0:
+            report['evaluations_per_second'] = self.counters['distance_evaluations'] / search['seconds']
+        return report
+
+# times a whole PoissonGenerator method as one phase while stats are installed
+def stats_phase(name):
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            if self.stats is None:
+                return method(self, *args, **kwargs)
+            with self.stats.phase(name):
+                return method(self, *args, **kwargs)
+        return timed
+    return decorate
+
+# named shapes, same set as the GUI: (num_dim, disk, repeatPattern, allow_rotations)
+shapes = {
+    'line': (1, False, False, False),
+    'repeated_line': (1, False, True, False),
+    'disk': (2, True, False, False),
+    'rotated_disk': (2, True, False, True),
+    'rect': (2, False, False, False),
+    'repeated_rect': (2, False, True, False),
+    'sphere': (3, True, False, False),
+    'box': (3, False, False, False),
+    'repeated_box': (3, False, True, False),
+}
+
 class PoissonGenerator:
-    def __init__(self, num_dim, disk, repeatPattern, first_point_zero):
+    # seed is an int, a np.random.Generator or None for the global np.random state
+    # num_dim is any dimension from 1, 'disk' domains are the unit disk, sphere or hyperball
+    def __init__(self, num_dim, disk, repeatPattern, first_point_zero, spatial_index = 'auto', seed = None):
+        if spatial_index not in spatial_indices and spatial_index != 'auto':
+            raise ValueError("unknown spatial index '%s', expected one of %s" % (spatial_index, sorted(spatial_indices) + ['auto']))
+        self.spatial_index = spatial_index
+        self.seed = seed
+        self.rng = np.random if seed is None else np.random.default_rng(seed)
         self.first_point_zero = first_point_zero
         self.disk = disk
         self.num_dim = num_dim
         self.repeatPattern = repeatPattern and disk == False
         self.num_perms = (3 ** self.num_dim) if self.repeatPattern else 1
+        # the point itself comes first, so every num_perms-th row of a permuted set is an original point
+        self.perm_offsets = np.zeros((1, num_dim))
+        if self.repeatPattern:
+            offsets = lattice_offsets(num_dim)
+            self.perm_offsets = np.concatenate((self.perm_offsets, offsets[np.any(offsets != 0, axis = 1)]))
+        self.rotations = 1
+        self.density = None
+        self.sampler_key = ('random', None)
+        self.stats = None
+        self.lower_bound = -1.0 if disk else 0.0
+        self.upper_bound = 1.0
+        self.zero_point = [0] * num_dim
+        self.random_point = self.uniform_sampler()
 
-        if num_dim == 3:
-            self.zero_point = [0,0,0]
-            if disk == True:
-                self.random_point = random_point_sphere
-            else:
-                self.random_point = random_point_box
-        elif num_dim == 2:
-            self.zero_point = [0,0]
-            if disk == True:
-                self.random_point = random_point_disk
-            else:
-                self.random_point = random_point_square
+    # restarts sent to worker processes pickle the generator, the np.random module of unseeded generators cannot be
+    # pickled and is restored on the other side (workers draw from their restart seeds anyway)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if state['rng'] is np.random:
+            state['rng'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = np.random
+
+    # random_point_* sampler of the domain, the 1-3D ones stay so seeded sets do not change
+    def uniform_sampler(self):
+        if self.disk and self.num_dim > 1:
+            if self.num_dim <= 3:
+                return random_point_sphere if self.num_dim == 3 else random_point_disk
+            return functools.partial(random_point_ball, num_dim = self.num_dim)
+        if self.num_dim <= 3:
+            return {1: random_point_line, 2: random_point_square, 3: random_point_box}[self.num_dim]
+        return functools.partial(random_point_cube, num_dim = self.num_dim)
+
+    # candidate distribution: stream is 'random', 'r2' or 'sobol' (poisson_sampling.streams), density is an array with
+    # num_dim axes over the pattern's bounding box (see poisson_sampling.DensityTable) or a function of (N, num_dim)
+    # points tabulated on a resolution^num_dim grid. With a density, squared distances are scaled by density^(2/num_dim)
+    # so the spacing follows it. dart_throwing and relax stay uniform. The defaults restore the random_point_* samplers.
+    def set_sampler(self, stream = 'random', density = None, resolution = 64):
+        ball = self.disk and self.num_dim > 1
+        lower = self.lower_bound if ball else 0.0
+        if density is not None:
+            if callable(density):
+                density = poisson_sampling.DensityTable.from_function(density, self.num_dim, lower, self.upper_bound, resolution).density
+            density = np.asarray(density, dtype = float)
+            if ball:
+                # cells entirely outside the disk/sphere would only feed rejected candidates
+                edges = [np.linspace(lower, self.upper_bound, size + 1) for size in density.shape]
+                nearest = [np.where(e[:-1] * e[1:] > 0.0, np.minimum(e[:-1] ** 2, e[1:] ** 2), 0.0) for e in edges]
+                density = np.where(sum(np.ix_(*nearest)) < 1.0, density, 0.0)
+            density = poisson_sampling.DensityTable(density, lower, self.upper_bound)
+        self.density = density
+        self.sampler_key = (stream, None if density is None else hashlib.sha1(np.ascontiguousarray(density.density).tobytes()).hexdigest())
+        if stream == 'random' and density is None:
+            self.random_point = self.uniform_sampler()
         else:
-            self.zero_point = [0]
-            self.random_point = random_point_line
+            self.random_point = poisson_sampling.Sampler(self.num_dim, self.disk, stream, density)
 
-    def first_point(self):
+    # stats is a GenerationStats that collects timings and counters of every following call, None turns it off again
+    def set_stats(self, stats = None):
+        self.stats = stats
+        return stats
+
+    # factor of squared distances at points, 1 without a density
+    def density_weight(self, points):
+        return self.density(points) ** (2.0 / self.num_dim)
+
+    def first_point(self, rng = None):
         if self.first_point_zero == True:
             return np.array(self.zero_point)
-        return self.random_point(1)[0]
-
-    def find_next_point(self, current_points, iterations_per_point):
-        best_dist = 0
-        best_point = []
-        random_points = self.random_point(iterations_per_point)
-        for new_point in random_points:
-            dist = min_dist_squared(current_points, new_point)
-            if dist > best_dist:
-                best_dist = dist
-                best_point = new_point
-        return best_point
+        return self.random_point(1, rng or self.rng)[0]
+
+    # current_points is either an array of (permuted) points or one of the spatial indices
+    def find_next_point(self, current_points, iterations_per_point, rng = None):
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        random_points = self.random_point(iterations_per_point, rng or self.rng)
+        if isinstance(current_points, np.ndarray):
+            dists = min_dist_squared_batch(current_points, random_points)
+            evaluations = len(current_points) * len(random_points)
+        else:
+            evaluations = current_points.evaluations
+            dists = current_points.min_dist_squared(random_points)
+            evaluations = current_points.evaluations - evaluations
+        if self.density is not None:
+            dists = dists * self.density_weight(random_points)
+        if stats is not None:
+            stats.add_time('find_next_point', time.perf_counter() - start)
+            stats.count('candidates', len(random_points))
+            stats.count('distance_evaluations', evaluations)
+            # candidates, their distances and the largest distance block of min_dist_squared_batch
+            stats.allocate('find_next_point', random_points.nbytes + dists.nbytes + min(evaluations, max_block_elements) * dists.itemsize)
+        return random_points[np.argmax(dists)]
 
     def permute_point(self, point):
-        out_array = np.array(point,ndmin = 2)
-        if not self.repeatPattern:
-            return out_array
-
-        if self.num_dim == 3:
-            for z in range(-1,2):
-                for y in range(-1,2):
-                    for x in range(-1,2):
-                        if y != 0 or x != 0 or z != 0:
-                            perm_point = point+[x,y,z]
-                            out_array = np.append(out_array, np.array(perm_point,ndmin = 2), axis = 0 )
-        elif self.num_dim == 2:            
-            for y in range(-1,2):
-                for x in range(-1,2):
-                    if y != 0 or x != 0:
-                        perm_point = point+[x,y]
-                        out_array = np.append(out_array, np.array(perm_point,ndmin = 2), axis = 0 )
+        if self.stats is not None:
+            start = time.perf_counter()
+            permuted = np.array(point, ndmin = 2) + self.perm_offsets
+            self.stats.add_time('permute_point', time.perf_counter() - start)
+            self.stats.allocate('permute_point', permuted.nbytes)
+            return permuted
+        return np.array(point, ndmin = 2) + self.perm_offsets
+
+    def permute_points(self, points):
+        return (points[:, np.newaxis, :] + self.perm_offsets).reshape(-1, self.num_dim)
+
+    # yields the accepted prefix after every new point
+    def iter_points(self, num_points, iterations_per_point, rng = None):
+        # rotation symmetry replaces the distance metric, so it takes precedence over the configured index
+        spatial_index = auto_spatial_index(self.num_dim, self.repeatPattern, num_points) if self.spatial_index == 'auto' else self.spatial_index
+        index_class = RotationIndex if self.rotations > 1 else spatial_indices[spatial_index]
+        index = index_class(self, num_points)
+        index.insert(self.first_point(rng))
+        yield index.points()
+        for i in range(num_points-1):
+            index.insert(self.find_next_point(index, iterations_per_point, rng))
+            yield index.points()
+        if self.stats is not None:
+            self.stats.allocate('index', index.nbytes())
+
+    # same greedy farthest-candidate order as iter_points, but drawn from one persistent pool of
+    # num_points * candidate_pool candidates whose nearest distances are updated incrementally
+    def iter_points_from_pool(self, num_points, candidate_pool, rng = None):
+        candidates = self.random_point(num_points * candidate_pool, rng or self.rng)
+        weights = None if self.density is None else self.density_weight(candidates)
+        if self.rotations > 1:
+            # a candidate's own rotated copies never move, every accepted point is inserted with all of its rotations
+            initial_dist = self_rotation_dist_squared(candidates, self.rotations)
+            pool = CandidatePool(candidates, self.lower_bound, self.upper_bound, False, initial_dist = initial_dist if weights is None else initial_dist * weights,
+                weights = weights)
+            insert = lambda point: [pool.insert(copy) for copy in rotated_copies(point[np.newaxis, :], self.rotations)]
         else:
-            for x in range(-1,2):
-                if x != 0:
-                    perm_point = point+[x]
-                    out_array = np.append(out_array, np.array(perm_point,ndmin = 2), axis = 0 )
+            pool = CandidatePool(candidates, self.lower_bound, self.upper_bound, self.repeatPattern, weights = weights)
+            insert = pool.insert
+        points = np.zeros((num_points, self.num_dim))
+        points[0] = self.first_point(rng)
+        insert(points[0])
+        yield points[:1]
+        for i in range(1, num_points):
+            points[i] = pool.best()
+            insert(points[i])
+            yield points[:i + 1]
+        if self.stats is not None:
+            self.stats.count('candidates', len(candidates))
+            self.stats.count('distance_evaluations', pool.evaluations)
+            self.stats.allocate('candidate_pool', pool.nbytes())
 
-        return out_array
+    def generate_points(self, num_points, iterations_per_point, rng = None):
+        for points in self.iter_points(num_points, iterations_per_point, rng):
+            pass
+        return points
 
-    def find_point_set(self, num_points, num_iter, iterations_per_point, rotations, progress_notification = None):
-        best_point_set = []
-        best_dist_avg = 0
-        self.rotations = 1
-        if self.disk and self.num_dim == 2:
-            rotations = max(rotations, 1)
-            self.rotations = rotations
-
-        for i in range(num_iter):
-            if progress_notification != None:
-                progress_notification(i / num_iter)
-            points = self.permute_point(self.first_point())
-
-            for i in range(num_points-1):
-                next_point = self.find_next_point(points, iterations_per_point)
-                points = np.append(points, self.permute_point(next_point), axis = 0)
-
-            current_set_dist = 0
-
-            if rotations > 1:
-                points_permuted = np.copy(points)
-                for rotation in range(1, rotations):
-                    rot_angle = rotation * math.pi * 2.0 / rotations
-                    s, c = math.sin(rot_angle), math.cos(rot_angle)
-                    rot_matrix = np.matrix([[c, -s], [s, c]])
-                    points_permuted = np.append(points_permuted, np.array(np.dot(points, rot_matrix)), axis = 0)
-                current_set_dist = np.min(scipy.spatial.distance.pdist(points_permuted))
-            else:
-                current_set_dist = np.min(scipy.spatial.distance.pdist(points))
+    def generate_points_from_pool(self, num_points, candidate_pool, rng = None):
+        for points in self.iter_points_from_pool(num_points, candidate_pool, rng):
+            pass
+        return points
 
-            if current_set_dist > best_dist_avg:
-                best_dist_avg = current_set_dist
-                best_point_set = points
-        return best_point_set[::self.num_perms,:]
+    # with a density, the smallest nearest distance scaled by density^(1/num_dim) at the point
+    def set_quality(self, points, stop_below = None):
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        if self.density is not None:
+            quality = np.min(nearest_dist(points, self.repeatPattern, self.rotations) * np.sqrt(self.density_weight(points)), initial = np.inf)
+        else:
+            quality = min_pairwise_dist(points, self.repeatPattern, self.rotations, stop_below)
+        if stats is not None:
+            stats.add_time('quality', time.perf_counter() - start)
+        return quality
 
-    def cache_sort(self, points, sorting_buckets):
-        if sorting_buckets < 1:
-            return points
-        if self.num_dim == 3:
-            points_discretized = np.floor(points * [sorting_buckets,-sorting_buckets, sorting_buckets])
-            indices_cache_space = np.array(points_discretized[:,2] * sorting_buckets * 4 + points_discretized[:,1] * sorting_buckets * 2 + points_discretized[:,0])
-            points = points[np.argsort(indices_cache_space)]
-        elif self.num_dim == 2:
-            points_discretized = np.floor(points * [sorting_buckets,-sorting_buckets])
-            indices_cache_space = np.array(points_discretized[:,1] * sorting_buckets * 2 + points_discretized[:,0])
-            points = points[np.argsort(indices_cache_space)]        
+    # histogram of nearest neighbour distances, np.histogram's (counts, bin_edges)
+    def quality_histogram(self, points, bins = 32):
+        dist = nearest_dist(points, self.repeatPattern, self.rotations)
+        return np.histogram(dist[np.isfinite(dist)], bins = bins)
+
+    def iter_restart(self, num_points, iterations_per_point, candidate_pool, seed):
+        rng = np.random.default_rng(seed)
+        if candidate_pool > 0:
+            return self.iter_points_from_pool(num_points, candidate_pool, rng)
+        return self.iter_points(num_points, iterations_per_point, rng)
+
+    # one independent restart with its own generator, so it gives the same set in any process
+    def find_restart(self, num_points, iterations_per_point, candidate_pool, seed):
+        for points in self.iter_restart(num_points, iterations_per_point, candidate_pool, seed):
+            pass
+        return points, self.set_quality(points)
+
+    # find_restart in a worker process, the stats are collected fresh and returned for the parent to merge
+    def find_restart_stats(self, num_points, iterations_per_point, candidate_pool, seed):
+        self.stats = GenerationStats()
+        with self.stats.phase('restart'):
+            points, quality = self.find_restart(num_points, iterations_per_point, candidate_pool, seed)
+        return points, quality, self.stats
+
+    def restart_seeds(self, num_iter, seed = None):
+        if seed is None:
+            seed = self.seed
+        if seed is None:
+            return np.random.randint(0, 2 ** 31, size = num_iter)
+        if isinstance(seed, np.random.Generator):
+            return seed.integers(0, 2 ** 31, size = num_iter)
+        return np.random.SeedSequence(seed).generate_state(num_iter)
+
+    # rotated copies only apply to the 2D disk
+    def set_rotations(self, rotations):
+        self.rotations = max(rotations, 1) if self.disk and self.num_dim == 2 else 1
+
+    # streams GenerationState snapshots: after every restart, every yield_every accepted points (serial runs only) and a final
+    # one with finished set. Generation stops early once cancel() returns True or time_budget seconds have passed, the final
+    # state then holds the best finished restart, or the accepted prefix of the current one if none has finished
+    # (None with workers > 1, where restarts are not observed until they finish).
+    def iter_point_set(self, num_points, num_iter, iterations_per_point, rotations, yield_every = 0, time_budget = None, cancel = None, candidate_pool = 0, workers = 1, seed = None):
+        self.set_rotations(rotations)
+        seeds = self.restart_seeds(num_iter, seed)
+        start_time = time.time()
+
+        def should_stop():
+            return (cancel is not None and cancel()) or (time_budget is not None and time.time() - start_time > time_budget)
+
+        def state(points, quality, num_done, num_accepted, progress, finished = False):
+            return GenerationState(points, quality, num_done, num_iter, num_accepted, progress, time.time() - start_time, finished)
+
+        best_point_set, best_dist_avg = None, -1.0
+        num_done = 0
+        if workers > 1 and num_iter > 1:
+            results = [None] * num_iter
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers = workers)
+            find_restart = self.find_restart if self.stats is None else self.find_restart_stats
+            futures = {executor.submit(find_restart, num_points, iterations_per_point, candidate_pool, restart_seed): i for i, restart_seed in enumerate(seeds)}
+            pending = set(futures)
+            # the pool is shut down however the loop ends, also when a restart fails or the consumer stops early. Queued
+            # restarts are cancelled, the ones already running finish in the background
+            try:
+                while pending and not should_stop():
+                    done, pending = concurrent.futures.wait(pending, timeout = 0.1, return_when = concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        if self.stats is not None:
+                            self.stats.merge(result[2])
+                        results[futures[future]] = result[:2]
+                    if done:
+                        # restarts are compared in seed order, so the pick does not depend on completion order
+                        best_point_set, best_dist_avg = None, -1.0
+                        for result in results:
+                            if result is not None and result[1] > best_dist_avg:
+                                best_point_set, best_dist_avg = result
+                        num_done = num_iter - len(pending)
+                        yield state(best_point_set, best_dist_avg, num_done, num_points, num_done / num_iter)
+            finally:
+                executor.shutdown(wait = False, cancel_futures = True)
+            if self.stats is not None:
+                for result in results:
+                    if result is not None:
+                        self.stats.record_restart(len(result[0]), result[1])
         else:
-            points_discretized = np.floor(points * [sorting_buckets])
-            indices_cache_space = np.array(points_discretized[:,0])
-            points = points[np.argsort(indices_cache_space)]
+            for i in range(num_iter):
+                stopped = False
+                if self.stats is not None:
+                    restart_start = time.perf_counter()
+                for points in self.iter_restart(num_points, iterations_per_point, candidate_pool, seeds[i]):
+                    num_accepted = len(points)
+                    if should_stop():
+                        stopped = True
+                        break
+                    if yield_every > 0 and num_accepted % yield_every == 0 and num_accepted < num_points:
+                        progress = (i + num_accepted / num_points) / num_iter
+                        if best_point_set is None:
+                            yield state(points.copy(), self.set_quality(points), i, num_accepted, progress)
+                        else:
+                            yield state(best_point_set, best_dist_avg, i, num_accepted, progress)
+                if stopped:
+                    if best_point_set is None:
+                        best_point_set, best_dist_avg = points.copy(), self.set_quality(points)
+                    break
+                if self.stats is not None:
+                    # scored in full, so restart_quality shows the spread of all restarts
+                    current_set_dist = self.set_quality(points)
+                    self.stats.add_time('restart', time.perf_counter() - restart_start)
+                    self.stats.record_restart(len(points), current_set_dist)
+                else:
+                    current_set_dist = self.set_quality(points, best_dist_avg)
+                if current_set_dist > best_dist_avg:
+                    best_dist_avg = current_set_dist
+                    best_point_set = points
+                num_done = i + 1
+                yield state(best_point_set, best_dist_avg, num_done, num_points, num_done / num_iter)
+
+        yield state(best_point_set, best_dist_avg, num_done, len(best_point_set) if best_point_set is not None else 0, 1.0, True)
+
+    # relax_iterations > 0 refines the best restart with relax()
+    @stats_phase('find_point_set')
+    def find_point_set(self, num_points, num_iter, iterations_per_point, rotations, progress_notification = None, candidate_pool = 0, workers = 1, seed = None, relax_iterations = 0):
+        if progress_notification != None:
+            progress_notification(0.0)
+        for state in self.iter_point_set(num_points, num_iter, iterations_per_point, rotations, candidate_pool = candidate_pool, workers = workers, seed = seed):
+            if progress_notification != None and not state.finished:
+                progress_notification(state.progress)
+        return self.relax(state.points, relax_iterations)
+
+    # squared distances between every candidate and every point of the same set, (num_sets, num_candidates, num_points)
+    def batch_dist_squared(self, candidates, points):
+        if self.rotations > 1:
+            sector = math.pi * 2.0 / self.rotations
+            candidates_radius = np.hypot(candidates[..., 0], candidates[..., 1])[:, :, np.newaxis]
+            candidates_angle = np.arctan2(candidates[..., 1], candidates[..., 0])[:, :, np.newaxis]
+            radius = np.hypot(points[..., 0], points[..., 1])[:, np.newaxis, :]
+            delta = np.mod(candidates_angle - np.arctan2(points[..., 1], points[..., 0])[:, np.newaxis, :], sector)
+            delta = np.minimum(delta, sector - delta)
+            return np.maximum(candidates_radius ** 2 + radius ** 2 - 2.0 * candidates_radius * radius * np.cos(delta), 0.0)
+        if self.repeatPattern:
+            diff = candidates[:, :, np.newaxis, :] - points[:, np.newaxis, :, :]
+            diff -= np.round(diff)
+            return np.einsum('ijkl,ijkl->ijk', diff, diff)
+        dist = np.einsum('ijk,ijk->ij', points, points)[:, np.newaxis, :] - 2.0 * np.matmul(candidates, points.transpose(0, 2, 1))
+        return np.maximum(dist + np.einsum('ijk,ijk->ij', candidates, candidates)[:, :, np.newaxis], 0.0)
+
+    # best-candidate search for many independent sets at once, every step samples and scores the candidates of all sets
+    # in one pass. Returns (num_sets, num_points, num_dim) of unselected restarts.
+    def generate_point_batch(self, num_sets, num_points, iterations_per_point, rng):
+        points = np.zeros((num_sets, num_points, self.num_dim))
+        if self.first_point_zero:
+            points[:, 0] = self.zero_point
+        else:
+            points[:, 0] = self.random_point(num_sets, rng)
+        stats = self.stats
+        for i in range(1, num_points):
+            if stats is not None:
+                start = time.perf_counter()
+            candidates = self.random_point(num_sets * iterations_per_point, rng).reshape(num_sets, iterations_per_point, self.num_dim)
+            best_dist = self_rotation_dist_squared(candidates.reshape(-1, 2), self.rotations).reshape(num_sets, -1) if self.rotations > 1 else np.full(candidates.shape[:2], np.inf)
+            block_size = max(1, max_block_elements // (num_sets * iterations_per_point * self.num_dim))
+            for start in range(0, i, block_size):
+                block = points[:, start:min(i, start + block_size)]
+                np.minimum(best_dist, np.min(self.batch_dist_squared(candidates, block), axis = 2), out = best_dist)
+            if self.density is not None:
+                best_dist *= self.density_weight(candidates.reshape(-1, self.num_dim)).reshape(num_sets, -1)
+            points[:, i] = candidates[np.arange(num_sets), np.argmax(best_dist, axis = 1)]
+            if stats is not None:
+                stats.add_time('find_next_point', time.perf_counter() - start)
+                stats.count('candidates', candidates.shape[0] * candidates.shape[1])
+                stats.count('distance_evaluations', candidates.shape[0] * candidates.shape[1] * i)
+                stats.allocate('find_next_point', candidates.nbytes + best_dist.nbytes * (1 + min(block_size, i)))
+        if stats is not None:
+            stats.count('accepted_points', points.shape[0] * points.shape[1])
+            stats.allocate('point_batch', points.nbytes)
         return points
 
-    def format_points_string(self, points):
-        types_hlsl = ["float", "float2", "float3"]
-
-        points_str_hlsl = "// hlsl array\n"
-        points_str_hlsl += "static const uint SAMPLE_NUM = " + str(points.size // self.num_dim) + ";\n"
-        points_str_hlsl += "static const " + types_hlsl[self.num_dim-1] + " POISSON_SAMPLES[SAMPLE_NUM] = \n{ \n"
-
-        points_str_cpp = "// C++ array\n"
-        points_str_cpp += "const int SAMPLE_NUM = " + str(points.size // self.num_dim) + ";\n"
-        points_str_cpp += "const float POISSON_SAMPLES[SAMPLE_NUM][" + str(self.num_dim) + "] = \n{ \n"
-
-        if self.num_dim == 3:
-            for p in points:
-                points_str_hlsl += "float3( " + str(p[0]) + "f, " + str(p[1]) + "f, " + str(p[2]) + "f ), \n"
-                points_str_cpp += str(p[0]) + "f, " + str(p[1]) + "f, " + str(p[2]) + "f, \n"
-        elif self.num_dim == 2:
-            for p in points:
-                points_str_hlsl += "float2( " + str(p[0]) + "f, " + str(p[1]) + "f ), \n"
-                points_str_cpp += str(p[0]) + "f, " + str(p[1]) + "f, \n"
+    def batch_rng(self, seed):
+        return np.random.default_rng(self.restart_seeds(1, seed)[0])
+
+    # num_sets independent patterns as one (num_sets, num_points, num_dim) array, each the best of num_iter restarts
+    @stats_phase('find_point_sets')
+    def find_point_sets(self, num_sets, num_points, num_iter, iterations_per_point, rotations, seed = None):
+        self.set_rotations(rotations)
+        restarts = self.generate_point_batch(num_sets * num_iter, num_points, iterations_per_point, self.batch_rng(seed))
+        restarts = restarts.reshape(num_sets, num_iter, num_points, self.num_dim)
+        quality = np.array([[self.set_quality(points) for points in sets] for sets in restarts])
+        return restarts[np.arange(num_sets), np.argmax(quality, axis = 1)]
+
+    # a family of kernels for several point counts: sequences are progressive, so one batch of the largest count serves
+    # every smaller one and each count keeps the restart whose prefix scores best. Returns {num_points: (num_sets, num_points, num_dim)}.
+    @stats_phase('find_point_sets')
+    def find_point_set_family(self, point_counts, num_sets, num_iter, iterations_per_point, rotations, seed = None):
+        self.set_rotations(rotations)
+        max_points = max(point_counts)
+        restarts = self.generate_point_batch(num_sets * num_iter, max_points, iterations_per_point, self.batch_rng(seed))
+        restarts = restarts.reshape(num_sets, num_iter, max_points, self.num_dim)
+        family = {}
+        for num_points in point_counts:
+            quality = np.array([[self.set_quality(points[:num_points]) for points in sets] for sets in restarts])
+            family[num_points] = restarts[np.arange(num_sets), np.argmax(quality, axis = 1), :num_points]
+        return family
+
+    # dense Poisson-disk set with minimum distance radius in O(N): parallel dart throwing on a grid of at most
+    # radius / sqrt(num_dim) cells holding at most one point each. Cells of one phase are more than radius apart, so all
+    # empty cells of a phase take a dart at once without conflicts; every empty cell gets attempts darts. The output is in
+    # grid order unless progressive is set, then it is reordered with progressive_order. The neighbourhood grows as
+    # (2 sqrt(num_dim) + 1)^num_dim cells, so this stays practical up to about 4D.
+    @stats_phase('dart_throwing')
+    def dart_throwing(self, radius, attempts = 30, progressive = False, rng = None):
+        rng = rng or self.rng
+        num_dim = self.num_dim
+        ball = self.disk and num_dim > 1
+        lower = self.lower_bound if ball else 0.0
+        extent = self.upper_bound - lower
+        if not radius > 0:
+            raise ValueError('dart throwing needs a positive radius, got %r' % radius)
+        if self.repeatPattern and radius >= extent:
+            # a period is no longer than radius, so only the first point fits and no grid can tile with whole phase strides
+            return self.first_point(rng)[np.newaxis, :]
+        initial_size = grid_size = max(1, int(math.ceil(extent * math.sqrt(num_dim) / radius)))
+        while True:
+            # cells spanned by radius, a periodic grid must tile with whole phase strides, which can shrink the cells again
+            reach = int(math.ceil(radius * grid_size / extent))
+            stride = reach + 1
+            if not self.repeatPattern or grid_size % stride == 0:
+                break
+            if grid_size > 2 * initial_size:
+                # no tiling grid nearby (radius near a fraction of the period): keep the first grid with the smallest stride
+                # dividing it, at worst the whole grid with one cell per phase
+                grid_size = initial_size
+                reach = int(math.ceil(radius * grid_size / extent))
+                stride = next(size for size in range(min(reach + 1, grid_size), grid_size + 1) if grid_size % size == 0)
+                break
+            grid_size = -(-grid_size // stride) * stride
+        cell_size = extent / grid_size
+        radius_squared = radius * radius
+
+        # neighbour cells that can hold a point closer than radius, nearest first so most darts fail early
+        offsets = lattice_offsets(num_dim, reach)
+        gaps = np.sum((np.maximum(np.abs(offsets) - 1, 0) * cell_size) ** 2, axis = 1)
+        offsets = offsets[(gaps < radius_squared) & np.any(offsets != 0, axis = 1)]
+        offsets = offsets[np.argsort(np.sum(offsets ** 2, axis = 1), kind = 'stable')]
+
+        # the grid is padded by reach empty cells on every side, so neighbours are plain flat offsets; with repeatPattern the
+        # padding holds the wrapped images of accepted points instead
+        padded_size = grid_size + 2 * reach
+        padded_strides = padded_size ** np.arange(num_dim - 1, -1, -1, dtype = np.int64)
+        grid = np.full((padded_size ** num_dim, num_dim), np.nan)
+        neighbour_offsets = np.dot(offsets, padded_strides)
+        cells = np.indices((grid_size,) * num_dim).reshape(num_dim, -1).T
+        cell_lower = lower + cells * cell_size
+        flat_cells = np.dot(cells + reach, padded_strides)
+
+        images = self.perm_offsets if self.repeatPattern else self.perm_offsets[:1]
+        def store(cells, points):
+            # every point with all of its periodic images at once
+            padded = (cells[:, np.newaxis, :] + reach + images.astype(np.int64) * grid_size).reshape(-1, num_dim)
+            inside = np.all((padded >= 0) & (padded < padded_size), axis = 1)
+            grid[np.dot(padded[inside], padded_strides)] = (points[:, np.newaxis, :] + images * extent).reshape(-1, num_dim)[inside]
+
+        live = np.ones(len(cells), dtype = bool)
+        if ball:
+            nearest = np.clip(0.0, cell_lower, cell_lower + cell_size)
+            live = np.sum(nearest ** 2, axis = 1) < 1.0
+        if self.first_point_zero:
+            zero = np.array(self.zero_point, dtype = float)
+            zero_cell = np.minimum(np.floor((zero - lower) / cell_size).astype(np.int64), grid_size - 1)
+            store(zero_cell[np.newaxis, :], zero[np.newaxis, :])
+
+        phases = np.dot(cells % stride, stride ** np.arange(num_dim))
+        phase_cells = [np.flatnonzero(live & (phases == phase)) for phase in range(stride ** num_dim)]
+        for attempt in range(attempts):
+            for phase, active in enumerate(phase_cells):
+                active = active[np.isnan(grid[flat_cells[active], 0])]
+                phase_cells[phase] = active
+                darts = cell_lower[active] + rng.random((len(active), num_dim)) * cell_size
+                if ball:
+                    inside = np.sum(darts ** 2, axis = 1) < 1.0
+                    active, darts = active[inside], darts[inside]
+                else:
+                    darts = np.minimum(darts, np.nextafter(self.upper_bound, lower))
+                flat = flat_cells[active]
+                if self.stats is not None:
+                    self.stats.count('darts', len(active))
+                # the nearest offsets reject most darts, the rest is tested in doubling chunks up to one distance block
+                start, num_offsets = 0, 1
+                while start < len(neighbour_offsets) and len(active) > 0:
+                    diff = darts[:, np.newaxis, :] - grid[flat[:, np.newaxis] + neighbour_offsets[start:start + num_offsets]]
+                    # empty neighbour cells are NaN and never reject
+                    keep = ~np.any(np.einsum('ijk,ijk->ij', diff, diff) < radius_squared, axis = 1)
+                    active, darts, flat = active[keep], darts[keep], flat[keep]
+                    start += num_offsets
+                    num_offsets = min(2 * num_offsets, max(1, max_block_elements // max(1, len(active) * num_dim)))
+                store(cells[active], darts)
+                if self.stats is not None:
+                    self.stats.count('darts_accepted', len(active))
+
+        if self.stats is not None:
+            self.stats.allocate('dart_throwing', grid.nbytes + cells.nbytes + cell_lower.nbytes + flat_cells.nbytes)
+        points = grid[flat_cells[~np.isnan(grid[flat_cells, 0])]]
+        if self.first_point_zero:
+            # keep the zero point in front, as in the best-candidate sets
+            first = np.flatnonzero(np.all(points == zero, axis = 1))[0]
+            points = np.concatenate((points[first:first + 1], np.delete(points, first, axis = 0)))
+        if progressive:
+            points = self.progressive_order(points, rng)
+        return points
+
+    # approximately progressive order of an existing set: from coarse to fine grids of 2^level cells per axis, every cell
+    # without a chosen point contributes its point nearest to the cell center, each level in random order
+    def progressive_order(self, points, rng = None):
+        rng = rng or self.rng
+        num_points = len(points)
+        coords = self.unit_coords(points)
+        chosen = np.zeros(num_points, dtype = bool)
+        order = []
+        if self.first_point_zero and num_points > 0:
+            chosen[0] = True
+            order.append(np.zeros(1, dtype = np.int64))
+        buckets = 1
+        while not np.all(chosen):
+            if buckets ** self.num_dim > 16 * num_points:
+                # only coincident points are left
+                remaining = np.flatnonzero(~chosen)
+                order.append(remaining[rng.permutation(len(remaining))])
+                break
+            cells = np.floor(coords * buckets).astype(np.int64)
+            cell_ids = rows_key(cells, buckets)
+            occupied = np.zeros(buckets ** self.num_dim, dtype = bool)
+            occupied[cell_ids[chosen]] = True
+            remaining = np.flatnonzero(~chosen & ~occupied[cell_ids])
+            center_dist = np.sum((coords[remaining] * buckets - cells[remaining] - 0.5) ** 2, axis = 1)
+            remaining = remaining[np.lexsort((center_dist, cell_ids[remaining]))]
+            first_in_cell = np.concatenate(([True], np.diff(cell_ids[remaining]) != 0)) if len(remaining) else np.zeros(0, dtype = bool)
+            level = remaining[first_in_cell]
+            order.append(level[rng.permutation(len(level))])
+            chosen[level] = True
+            buckets *= 2
+        return points[np.concatenate(order)] if order else points
+
+    # moves points back into the pattern domain: wrapped for repeatPattern, clamped to the unit disk/sphere or box otherwise
+    def constrain(self, points):
+        if self.repeatPattern:
+            points = np.mod(points, 1.0)
+            points[points >= 1.0] = 0.0
+        elif self.disk and self.num_dim > 1:
+            radius = np.sqrt(np.einsum('ij,ij->i', points, points))
+            outside = radius >= 1.0
+            # a margin over the rounding of the scaled coordinates
+            points[outside] *= ((1.0 - 1e-12) / radius[outside])[:, np.newaxis]
         else:
-            for p in points:
-                points_str_hlsl += str(p[0]) + "f, \n"
-                points_str_cpp += str(p[0]) + "f, \n"
+            points = np.clip(points, 0.0, np.nextafter(1.0, 0.0))
+        return points
 
-        points_str_hlsl += "};\n\n"
-        points_str_cpp += "};\n\n"
+    # repulsion post-pass: every iteration moves each point away from its nearest neighbours by step times its nearest
+    # distance, nearer neighbours weighted more. Moves that would bring a point closer to an earlier point than the
+    # current quality of its prefix are halved and finally dropped (or the whole iteration is), so no prefix ever gets
+    # worse. The first point stays at zero if first_point_zero. Rotated patterns are returned unchanged.
+    @stats_phase('relax')
+    def relax(self, points, iterations, step = 0.15, neighbours = 6):
+        if iterations < 1 or len(points) < 2 or self.rotations > 1:
+            return points
+        import scipy.spatial
+        points = self.constrain(np.array(points, dtype = float))
+        neighbours = min(neighbours, len(points) - 1)
+        for iteration in range(iterations):
+            prefix_quality = np.minimum.accumulate(nearest_earlier(points, self.repeatPattern)[0])
+            tree = scipy.spatial.cKDTree(points, boxsize = 1.0 if self.repeatPattern else None)
+            dist, index = tree.query(points, k = list(range(2, neighbours + 2)))
+            diff = points[:, np.newaxis, :] - points[index]
+            if self.repeatPattern:
+                diff -= np.round(diff)
+            weights = (dist[:, :1] / dist) ** 3 / dist
+            force = np.einsum('ijk,ij->ik', diff, weights)
+            move = force * (step * dist[:, 0] / np.maximum(np.sqrt(np.einsum('ij,ij->i', force, force)), 1e-300))[:, np.newaxis]
+            if self.first_point_zero:
+                move[0] = 0.0
+            moved = self.constrain(points + move)
+            for attempt in range(6):
+                new_dist, new_index = nearest_earlier(moved, self.repeatPattern)
+                conflicts = np.flatnonzero(new_dist < prefix_quality)
+                if len(conflicts) == 0:
+                    break
+                conflicts = np.union1d(conflicts, new_index[conflicts])
+                move[conflicts] *= 0.5
+                moved[conflicts] = self.constrain(points[conflicts] + move[conflicts])
+            # points still in conflict go back to where they were, which can make a new conflict with a third point.
+            # Every round puts back at least one more point, so this ends with no conflicts at the latest when all are back
+            for attempt in range(16):
+                new_dist, new_index = nearest_earlier(moved, self.repeatPattern)
+                conflicts = np.flatnonzero(new_dist < prefix_quality)
+                if len(conflicts) == 0:
+                    break
+                conflicts = np.union1d(conflicts, new_index[conflicts])
+                moved[conflicts] = points[conflicts]
+            else:
+                moved = points
+            points = moved
+        return points
 
-        return points_str_hlsl + points_str_cpp
+    # results of seeded generators are stored in cache_dir as .npy files keyed by every option that changes the output
+    def find_point_set_cached(self, cache_dir, num_points, num_iter, iterations_per_point, rotations, sorting_buckets = 0, progress_notification = None, candidate_pool = 0, workers = 1, sorting_curve = 'rows', relax_iterations = 0):
+        if not isinstance(self.seed, numbers.Integral):
+            points = self.find_point_set(num_points, num_iter, iterations_per_point, rotations, progress_notification, candidate_pool, workers,
+                relax_iterations = relax_iterations)
+            return self.cache_sort(points, sorting_buckets, sorting_curve)
 
-    def generate_ui(self, fig, points, highlightFirst = 0):
-        num_points = points.size // self.num_dim
-
-        if self.num_dim == 3:
-            ax = fig.add_subplot(111, projection='3d')
-            if self.disk == True:
-                #less optimal, more readable
-                sphere_guide = [[0,0,0]]
-                num_guides = 30
-                for theta in np.linspace(0, 2.0 * math.pi, num_guides):
-                    for phi in np.arccos(np.linspace(-1, 1.0, num_guides)):
-                        x = np.cos(theta) * np.sin(phi)
-                        y = np.sin(theta) * np.sin(phi)
-                        z = np.cos(phi)   
-                        sphere_guide = np.append(sphere_guide, np.array([[x,y,z]],ndmin = 2), axis = 0)
-                ax.plot_wireframe(sphere_guide[1:,0], sphere_guide[1:,1], sphere_guide[1:,2])
-                ax.set_xlim(-1,1)
-                ax.set_ylim(-1,1)
-                ax.set_zlim(-1,1)
-            elif self.repeatPattern == True:
-                ax.scatter(points[:,0], points[:,1], points[:,2] + 1, c='b')
-                ax.scatter(points[:,0], points[:,1] + 1, points[:,2] + 1, c='b')
-                ax.scatter(points[:,0] + 1, points[:,1] + 1, points[:,2] + 1, c='b')
-                ax.scatter(points[:,0] + 1, points[:,1], points[:,2] + 1, c='b')
-                ax.scatter(points[:,0], points[:,1] + 1, points[:,2], c='b')
-                ax.scatter(points[:,0] + 1, points[:,1] + 1, points[:,2], c='b')
-                ax.scatter(points[:,0] + 1, points[:,1], points[:,2], c='b')
-                
-                a = np.linspace(0, 2.0, 3)
-                b = np.linspace(0, 2.0, 3)
-                a, b = np.meshgrid(a,b)
-                ax.plot_wireframe(a, b, 1.0)
-                ax.plot_wireframe(a, 1.0, b)
-                ax.plot_wireframe(1.0, a, b)
-                
-                ax.set_xlim(0,2)
-                ax.set_ylim(0,2)
-                ax.set_zlim(0,2)
+        key = (cache_version, self.num_dim, bool(self.disk), bool(self.repeatPattern), bool(self.first_point_zero), num_points, num_iter,
+            iterations_per_point, rotations, int(self.seed), self.sampler_key, tuple(int(buckets) for buckets in np.atleast_1d(sorting_buckets)), candidate_pool, sorting_curve, relax_iterations)
+        cache_path = os.path.join(cache_dir, hashlib.sha1(repr(key).encode('ascii')).hexdigest() + '.npy')
+        if os.path.exists(cache_path):
+            self.set_rotations(rotations)
+            return np.load(cache_path)
+
+        points = self.find_point_set(num_points, num_iter, iterations_per_point, rotations, progress_notification, candidate_pool, workers,
+            relax_iterations = relax_iterations)
+        points = self.cache_sort(points, sorting_buckets, sorting_curve)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        temp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            np.save(f, points)
+        os.replace(temp_path, cache_path)
+        return points
+
+    # normalized to [0, 1) per axis over the pattern domain
+    def unit_coords(self, points):
+        return np.clip((points - self.lower_bound) / (self.upper_bound - self.lower_bound), 0.0, np.nextafter(1.0, 0.0))
 
+    # sorting_buckets is one bucket count per axis or a tile hierarchy from coarse to fine, e.g. (4, 32) orders 4 x 4 tiles
+    # first and 32 x 32 cells inside each of them. curve is 'rows' (x, then y from the top, then z), 'morton' or 'hilbert'.
+    # Counts are per unit length, so the [-1, 1] domain of disk patterns has twice as many buckets per axis.
+    @stats_phase('cache_sort')
+    def cache_sort(self, points, sorting_buckets, curve = 'rows'):
+        extent = int(self.upper_bound - self.lower_bound)
+        levels = [int(buckets) * extent for buckets in np.atleast_1d(sorting_buckets) if buckets >= 1]
+        if not levels or len(points) == 0:
+            return points
+        coords = self.unit_coords(points)
+        # np.lexsort sorts by its last key first, so the coarsest level goes last
+        keys = [sort_curves[curve](np.floor(coords * buckets).astype(np.int64), buckets) for buckets in reversed(levels)]
+        if self.stats is not None:
+            self.stats.allocate('cache_sort', coords.nbytes + sum(key.nbytes for key in keys))
+        return points[np.lexsort(keys)]
+
+    # expected texture cache behavior of sampling in this order: samples map to texels of a texture_size footprint over
+    # the pattern domain, texels are cached in tile_size tiles and an LRU cache holds cache_tiles of them
+    def cache_locality(self, points, texture_size = 256, tile_size = 8, cache_tiles = 16):
+        texels = np.floor(self.unit_coords(points) * texture_size).astype(np.int64)
+        tiles = np.dot(texels // tile_size, (texture_size // tile_size + 1) ** np.arange(self.num_dim))
+        cache = collections.OrderedDict()
+        hits = 0
+        for tile in tiles.tolist():
+            if tile in cache:
+                hits += 1
+                cache.move_to_end(tile)
             else:
-                ax.set_xlim(0,1)
-                ax.set_ylim(0,1)
-                ax.set_zlim(0,1)
-
-            ax.scatter(points[highlightFirst:,0], points[highlightFirst:,1], points[highlightFirst:,2], c='g')
-            ax.scatter(points[:highlightFirst,0], points[:highlightFirst,1], points[:highlightFirst,2], c='r')
-        elif self.num_dim == 2:
-            ax = fig.add_subplot(111)
-            if self.disk == True:
-                param = np.linspace(0, 2.0 * math.pi, 1000)
-                x = np.cos(param)
-                y = np.sin(param)
-                ax.plot(x, y, 'b-')    
-            elif self.repeatPattern == True:
-                ax.plot(points[:,0] + 1, points[:,1], 'bo')
-                ax.plot(points[:,0] + 1, points[:,1] + 1, 'bo')
-                ax.plot(points[:,0], points[:,1] + 1, 'bo')
-            if self.disk == False:
-                param = np.linspace(0, 2.0, 100)
-                ax.plot(param, [1] * 100, 'k')
-                ax.plot([1] * 100, param, 'k')
-            for rotation in range(1,self.rotations):
-                rot_angle = rotation * math.pi * 2.0 / self.rotations
-                s, c = math.sin(rot_angle), math.cos(rot_angle)
-                rot_matrix = np.matrix([[c, -s], [s, c]])
-                points_permuted = np.array(np.dot(points, rot_matrix))
-                ax.plot(points_permuted[:,0], points_permuted[:,1], 'bo')
-            ax.plot(points[:highlightFirst,0], points[:highlightFirst,1], 'go')
-            ax.plot(points[highlightFirst:,0], points[highlightFirst:,1], 'ro')
-        else:
-            ax = fig.add_subplot(111)
-            ax.plot(points[:highlightFirst,0], [0] * num_points, 'go')
-            ax.plot(points[highlightFirst:,0], [0] * num_points, 'ro')
-            if self.repeatPattern == True:
-                ax.plot(points[:,0] + 1, [0] * num_points, 'bo')
+                cache[tile] = True
+                if len(cache) > cache_tiles:
+                    cache.popitem(last = False)
+        jumps = np.sqrt(np.sum(np.diff(texels, axis = 0) ** 2, axis = 1))
+        return {'hit_rate': hits / len(tiles), 'mean_jump': float(np.mean(jumps)) if len(jumps) else 0.0}
+
+    # hlsl and C++ arrays written straight to a file path or stream, see poisson_export for binary formats
+    def write_points_string(self, points, target):
+        poisson_export.write_text(np.reshape(points, (-1, self.num_dim)), target)
+
+    def format_points_string(self, points):
+        stream = io.StringIO()
+        self.write_points_string(points, stream)
+        return stream.getvalue()
+
+    # plotting lives in poisson_plot so generating points never loads matplotlib
+    def generate_ui(self, fig, points, highlightFirst = 0):
+        import poisson_plot
+        return poisson_plot.generate_ui(self, fig, points, highlightFirst)
@@ -0,0 +1,169 @@
+from __future__ import division
+import math
+import numpy as np
+import poisson
+
+# quality analysis of generated sets without plots: periodograms on a grid (radially averaged power and anisotropy),
+# nearest neighbour statistics and the minimum distance of every prefix. Every function takes the generator for the
+# domain and either one (N, num_dim) set or a batch (M, N, num_dim) of sets, whose spectra are averaged.
+
+# periodograms are computed on at most this many grid cells
+max_spectrum_cells = 1 << 22
+
+# densest known sphere packing density per dimension from 1D: regular, hexagonal, fcc and the D4, D5, E6, E7 and E8
+# lattices. Higher dimensions fall back to the Minkowski-Hlawka bound 2^(1 - num_dim).
+packing_densities = [1.0, math.pi / math.sqrt(12.0), math.pi / math.sqrt(18.0), math.pi ** 2 / 16.0, math.pi ** 2 / (15.0 * math.sqrt(2.0)),
+    math.pi ** 3 / (48.0 * math.sqrt(3.0)), math.pi ** 3 / 105.0, math.pi ** 4 / 384.0]
+
+def ball_volume(num_dim):
+    return math.pi ** (num_dim / 2.0) / math.gamma(num_dim / 2.0 + 1.0)
+
+# volume of the pattern domain, the unit disk/ball or the unit line/square/box
+def domain_volume(generator):
+    if generator.disk and generator.num_dim > 1:
+        return ball_volume(generator.num_dim)
+    return 1.0
+
+# minimum distance of the densest packing of num_points (a number or an array) in volume: spheres of half that distance
+# filling packing_densities of it
+def ideal_min_dist(num_points, num_dim, volume = 1.0):
+    spacing = volume / np.asarray(num_points, dtype = float)
+    density = packing_densities[num_dim - 1] if num_dim <= len(packing_densities) else 2.0 ** (1 - num_dim)
+    return 2.0 * (density * spacing / ball_volume(num_dim)) ** (1.0 / num_dim)
+
+def relative_min_dist(generator, min_dist, num_points):
+    # rotated disks are packed with all rotated copies
+    num_copies = num_points * max(generator.rotations, 1)
+    return min_dist / ideal_min_dist(num_copies, generator.num_dim, domain_volume(generator))
+
+def as_batch(points):
+    points = np.asarray(points, dtype = float)
+    return points[np.newaxis] if points.ndim == 2 else points
+
+# points mapped to the unit cube of the periodogram grid
+def unit_points(generator, points):
+    if generator.disk and generator.num_dim > 1:
+        return (points + 1.0) * 0.5
+    return points
+
+def spectrum_resolution(num_points, num_dim):
+    # 4 cells per expected spacing puts the Nyquist frequency at about twice the blue noise peak
+    resolution = 1 << max(3, int(math.ceil(math.log2(4.0 * num_points ** (1.0 / num_dim)))))
+    while resolution ** num_dim > max_spectrum_cells and resolution > 4:
+        resolution //= 2
+    return resolution
+
+# |sum exp(-2 pi i k x)|^2 / N on an integer frequency grid of resolution^num_dim (cycles per unit cube, last axis halved
+# by rfftn), averaged over a batch. Points are deposited on the nearest grid cell. For disk/sphere domains the mean
+# density inside the domain is subtracted first so the domain boundary does not leak into low frequencies.
+def periodogram(generator, points, resolution = None):
+    points = as_batch(points)
+    num_sets, num_points, num_dim = points.shape
+    resolution = resolution or spectrum_resolution(num_points, num_dim)
+    shape = (resolution,) * num_dim
+    window = None
+    if generator.disk and num_dim > 1:
+        centers = (np.arange(resolution) + 0.5) / resolution * 2.0 - 1.0
+        window = (sum(np.ix_(*[centers ** 2] * num_dim)) < 1.0).astype(float)
+        window /= np.sum(window)
+    strides = resolution ** np.arange(num_dim - 1, -1, -1)
+    power = 0.0
+    for points_set in points:
+        cells = np.clip(np.floor(unit_points(generator, points_set) * resolution).astype(np.int64), 0, resolution - 1)
+        density = np.bincount(np.dot(cells, strides), minlength = resolution ** num_dim).reshape(shape).astype(float)
+        if window is not None:
+            density -= num_points * window
+        power = power + np.abs(np.fft.rfftn(density)) ** 2 / num_points
+    return power / num_sets
+
+# integer frequency vector length of every periodogram cell
+def frequency_radius(power_shape):
+    resolution = power_shape[0]
+    axes = [np.fft.fftfreq(resolution, 1.0 / resolution)] * (len(power_shape) - 1) + [np.arange(power_shape[-1])]
+    return np.sqrt(sum(np.ix_(*[axis ** 2 for axis in axes])))
+
+# (radii, mean power, anisotropy in dB) over rings of integer radius up to the Nyquist frequency, DC excluded.
+# Anisotropy is 10 log10(variance / mean^2) of the ring, about 0 dB for one isotropic periodogram and lower for averages.
+def radial_power(power):
+    radius = np.rint(frequency_radius(power.shape)).astype(np.int64).ravel()
+    values = power.ravel()
+    inside = (radius > 0) & (radius <= power.shape[0] // 2)
+    radius, values = radius[inside], values[inside]
+    count = np.bincount(radius)
+    ring_sum = np.bincount(radius, values)
+    ring_squares = np.bincount(radius, values ** 2)
+    radii = np.flatnonzero(count)
+    mean = ring_sum[radii] / count[radii]
+    variance = np.maximum(ring_squares[radii] / count[radii] - mean ** 2, 0.0)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        anisotropy = 10.0 * np.log10(variance / mean ** 2)
+    return radii, mean, anisotropy
+
+# frequency of the blue noise peak in periodogram units: one cycle per ideal spacing, measured in the unit cube
+def peak_frequency(generator, num_points):
+    spacing = ideal_min_dist(num_points, generator.num_dim, domain_volume(generator))
+    return (2.0 if generator.disk and generator.num_dim > 1 else 1.0) / spacing
+
+# nearest neighbour distances as {'min', 'mean', 'std', 'p01', 'p50', 'relative_min'}, each an array over a batch
+def nearest_neighbour_stats(generator, points):
+    stats = {key: [] for key in ('min', 'mean', 'std', 'p01', 'p50', 'relative_min')}
+    for points_set in as_batch(points):
+        dist = poisson.nearest_dist(points_set, generator.repeatPattern, generator.rotations)
+        if generator.density is not None:
+            dist = dist * np.sqrt(generator.density_weight(points_set))
+        dist = dist[np.isfinite(dist)]
+        if len(dist) == 0:
+            dist = np.array([np.inf])
+        stats['min'].append(np.min(dist))
+        stats['mean'].append(np.mean(dist))
+        stats['std'].append(np.std(dist))
+        stats['p01'].append(np.percentile(dist, 1))
+        stats['p50'].append(np.percentile(dist, 50))
+        stats['relative_min'].append(float(relative_min_dist(generator, stats['min'][-1], len(points_set))))
+    return {key: np.array(values) for key, values in stats.items()}
+
+# minimum distance of every prefix, entry n - 1 for the first n points (inf for one point), (N,) or (M, N)
+def prefix_min_dist(generator, points):
+    curves = []
+    for points_set in as_batch(points):
+        if generator.rotations > 1:
+            # every point against the rotations of itself and of all earlier points
+            polar = poisson.polar(points_set)
+            dist = np.sqrt(poisson.self_rotation_dist_squared(points_set, generator.rotations))
+            block_size = max(1, poisson.max_block_elements // len(points_set))
+            for start in range(0, len(points_set), block_size):
+                block = slice(start, start + block_size)
+                block_dist = poisson.rotated_dist_squared((polar[0][block], polar[1][block]), polar, generator.rotations)
+                block_dist[np.arange(block_dist.shape[0])[:, np.newaxis] + start <= np.arange(len(points_set))] = np.inf
+                dist[block] = np.minimum(dist[block], np.sqrt(np.min(block_dist, axis = 1)))
+        else:
+            dist = poisson.nearest_earlier(points_set, generator.repeatPattern)[0]
+        curves.append(np.minimum.accumulate(dist))
+    return curves[0] if np.ndim(points) == 2 else np.array(curves)
+
+def relative_prefix_min_dist(generator, points):
+    curve = prefix_min_dist(generator, points)
+    return relative_min_dist(generator, curve, np.arange(1, curve.shape[-1] + 1))
+
+# one report for a set or batch: nearest neighbour statistics, the radially averaged spectrum and its anisotropy,
+# mean power below half the expected peak frequency (white noise is 1, blue noise far lower) and the worst relative
+# minimum distance over the prefixes of at least min_prefix points
+def analyze(generator, points, resolution = None, min_prefix = 8):
+    points = np.asarray(points, dtype = float)
+    num_points = points.shape[-2]
+    radii, power, anisotropy = radial_power(periodogram(generator, points, resolution))
+    low = (radii > 0) & (radii < 0.5 * peak_frequency(generator, num_points))
+    prefixes = relative_prefix_min_dist(generator, points)[..., min(min_prefix, num_points) - 1:]
+    stats = nearest_neighbour_stats(generator, points)
+    return {
+        'num_points': num_points,
+        'min_dist': float(np.min(stats['min'])),
+        'relative_min_dist': float(np.min(stats['relative_min'])),
+        'mean_nn_dist': float(np.mean(stats['mean'])),
+        'std_nn_dist': float(np.mean(stats['std'])),
+        'low_frequency_power': float(np.mean(power[low])) if np.any(low) else float('nan'),
+        'worst_prefix_relative_min_dist': float(np.min(prefixes)) if prefixes.size else float('nan'),
+        'radii': radii,
+        'radial_power': power,
+        'anisotropy': anisotropy,
+    }
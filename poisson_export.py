@@ -0,0 +1,86 @@
+from __future__ import division
+import contextlib
+import numpy as np
+
+# exporters for generated point sets, every writer takes an (N, num_dim) array and a file path or an open stream
+
+# vector types per dimension, wider points are written as float[num_dim] rows
+types_hlsl = ["float", "float2", "float3", "float4"]
+
+@contextlib.contextmanager
+def open_target(target, mode):
+    if hasattr(target, 'write'):
+        yield target
+    else:
+        with open(target, mode) as f:
+            yield f
+
+# points formatted and written per chunk, so memory stays bounded however large the set is
+chunk_rows = 4096
+
+# the comma separated float literals of every point, formatted chunk_rows points at a time
+def iter_rows(points):
+    for start in range(0, len(points), chunk_rows):
+        for row in points[start:start + chunk_rows].tolist():
+            yield ', '.join(str(x) + 'f' for x in row)
+
+# hlsl and C++ arrays, the same text format_points_string returns, written chunk by chunk instead of built in memory
+def write_text(points, target):
+    num_points, num_dim = points.shape
+    with open_target(target, 'w') as f:
+        f.write("// hlsl array\n")
+        f.write("static const uint SAMPLE_NUM = " + str(num_points) + ";\n")
+        if num_dim > len(types_hlsl):
+            f.write("static const float POISSON_SAMPLES[SAMPLE_NUM][" + str(num_dim) + "] = \n{ \n")
+            f.writelines("{ " + row + " }, \n" for row in iter_rows(points))
+        else:
+            f.write("static const " + types_hlsl[num_dim-1] + " POISSON_SAMPLES[SAMPLE_NUM] = \n{ \n")
+            if num_dim > 1:
+                f.writelines(types_hlsl[num_dim-1] + "( " + row + " ), \n" for row in iter_rows(points))
+            else:
+                f.writelines(row + ", \n" for row in iter_rows(points))
+        f.write("};\n\n")
+
+        f.write("// C++ array\n")
+        f.write("const int SAMPLE_NUM = " + str(num_points) + ";\n")
+        f.write("const float POISSON_SAMPLES[SAMPLE_NUM][" + str(num_dim) + "] = \n{ \n")
+        f.writelines(row + ", \n" for row in iter_rows(points))
+        f.write("};\n\n")
+
+# shortest exact C99/C++17 hex literal of the float32 value
+def hex_float(x):
+    mantissa, exponent = float(np.float32(x)).hex().split('p')
+    return mantissa.rstrip('0').rstrip('.') + 'p' + exponent + 'f'
+
+# compact C/C++ header, float32 values as exact hex-float literals
+def write_hex_header(points, target, name = 'POISSON_SAMPLES', values_per_line = 8):
+    num_points, num_dim = points.shape
+    values = points.ravel()
+    chunk_values = values_per_line * chunk_rows
+    with open_target(target, 'w') as f:
+        f.write("const int SAMPLE_NUM = " + str(num_points) + ";\n")
+        f.write("const float " + name + "[SAMPLE_NUM][" + str(num_dim) + "] = {\n")
+        for start in range(0, len(values), chunk_values):
+            literals = [hex_float(x) for x in values[start:start + chunk_values].tolist()]
+            f.writelines(','.join(literals[i:i + values_per_line]) + ",\n" for i in range(0, len(literals), values_per_line))
+        f.write("};\n")
+
+# raw little-endian float32 or float16 values, row after row, ready to upload as a GPU buffer
+def write_raw(points, target, dtype = 'float32'):
+    data = np.ascontiguousarray(points, dtype = np.dtype(dtype).newbyteorder('<'))
+    with open_target(target, 'wb') as f:
+        f.write(data.tobytes())
+
+# .npy file, np.load(path, mmap_mode='r') maps it without reading
+def write_npy(points, target, dtype = 'float32'):
+    with open_target(target, 'wb') as f:
+        np.save(f, np.ascontiguousarray(points, dtype = np.dtype(dtype).newbyteorder('<')))
+
+# name: (file extension, binary, writer)
+formats = {
+    'text': ('.h', False, write_text),
+    'hex': ('.h', False, write_hex_header),
+    'raw32': ('.bin', True, lambda points, target: write_raw(points, target, 'float32')),
+    'raw16': ('.bin', True, lambda points, target: write_raw(points, target, 'float16')),
+    'npy': ('.npy', True, write_npy),
+}
@@ -0,0 +1,103 @@
+from __future__ import division
+import json
+import numbers
+import os
+import uuid
+import numpy as np
+import poisson
+import poisson_analysis
+
+# persistent library of generated sequences: every entry is a .npy file opened as a read-only memory map and
+# index.json lists them by dimension, shape, repeat/rotation mode and relative quality. Sequences are progressive, so
+# one long entry serves every smaller point count as a prefix slice without copying.
+
+index_name = 'index.json'
+
+def library_key(num_dim, disk, repeatPattern, rotations = 1):
+    disk = bool(disk)
+    repeatPattern = bool(repeatPattern) and not disk
+    rotations = max(int(rotations), 1) if disk and num_dim == 2 else 1
+    return (int(num_dim), disk, repeatPattern, rotations)
+
+# minimum distance relative to the densest packing, comparable across point counts unlike the raw quality. Computed for
+# entries indexed before it was stored
+def relative_quality(entry):
+    if 'relative_quality' in entry:
+        return entry['relative_quality']
+    volume = poisson_analysis.ball_volume(entry['num_dim']) if entry['disk'] and entry['num_dim'] > 1 else 1.0
+    return float(entry['quality'] / poisson_analysis.ideal_min_dist(entry['num_points'] * entry['rotations'], entry['num_dim'], volume))
+
+class SampleLibrary:
+    def __init__(self, path):
+        self.path = path
+        self.arrays = {}
+        self.reload()
+
+    def reload(self):
+        index_path = os.path.join(self.path, index_name)
+        self.entries = []
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.entries = json.load(f)['entries']
+        # per key, best relative quality first, so a lookup is a short scan for the first long enough entry
+        self.index = {}
+        for entry in self.entries:
+            entry['relative_quality'] = relative_quality(entry)
+            key = library_key(entry['num_dim'], entry['disk'], entry['repeatPattern'], entry['rotations'])
+            self.index.setdefault(key, []).append(entry)
+        for entries in self.index.values():
+            entries.sort(key = lambda entry: -entry['relative_quality'])
+
+    def array(self, entry):
+        points = self.arrays.get(entry['file'])
+        if points is None:
+            points = np.load(os.path.join(self.path, entry['file']), mmap_mode = 'r')
+            self.arrays[entry['file']] = points
+        return points
+
+    # prefix of the best entry with at least num_points points (the whole entry if None), or None if nothing matches.
+    # Entries below min_relative_dist are skipped, as in add
+    def lookup(self, num_dim, disk, repeatPattern, rotations = 1, num_points = None, min_relative_dist = None):
+        for entry in self.index.get(library_key(num_dim, disk, repeatPattern, rotations), []):
+            if min_relative_dist is not None and entry['relative_quality'] < min_relative_dist:
+                break
+            if num_points is None or entry['num_points'] >= num_points:
+                return self.array(entry)[:num_points]
+        return None
+
+    def lookup_shape(self, shape, num_points = None, rotations = 1, min_relative_dist = None):
+        num_dim, disk, repeatPattern, allow_rotations = poisson.shapes[shape]
+        return self.lookup(num_dim, disk, repeatPattern, rotations if allow_rotations else 1, num_points, min_relative_dist)
+
+    # entries record their minimum distance relative to the densest packing; sets below min_relative_dist are not stored
+    # and None is returned instead of the file name
+    def add(self, generator, points, quality = None, seed = None, min_relative_dist = None):
+        if quality is None:
+            quality = float(generator.set_quality(points))
+        relative_dist = float(poisson_analysis.relative_min_dist(generator, quality, len(points)))
+        if min_relative_dist is not None and relative_dist < min_relative_dist:
+            return None
+        num_dim, disk, repeatPattern, rotations = library_key(generator.num_dim, generator.disk, generator.repeatPattern, generator.rotations)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        file_name = 'samples_%dd_%s_%d_%s.npy' % (num_dim, 'disk' if disk else 'repeat' if repeatPattern else 'box', len(points), uuid.uuid4().hex[:12])
+        np.save(os.path.join(self.path, file_name), np.ascontiguousarray(points))
+
+        # merge with entries other processes may have added since we loaded the index
+        self.reload()
+        self.entries.append({'file': file_name, 'num_dim': num_dim, 'disk': disk, 'repeatPattern': repeatPattern, 'rotations': rotations,
+            'num_points': len(points), 'quality': float(quality), 'relative_quality': relative_dist, 'seed': seed})
+        index_path = os.path.join(self.path, index_name)
+        temp_path = '%s.%d.tmp' % (index_path, os.getpid())
+        with open(temp_path, 'w') as f:
+            json.dump({'entries': self.entries}, f, indent = 1)
+        os.replace(temp_path, index_path)
+        self.reload()
+        return file_name
+
+    # generates a new sequence with find_point_set and stores it if it passes min_relative_dist
+    def generate(self, generator, num_points, num_iter, iterations_per_point, rotations, min_relative_dist = None, **kwargs):
+        points = generator.find_point_set(num_points, num_iter, iterations_per_point, rotations, **kwargs)
+        seed = int(generator.seed) if isinstance(generator.seed, numbers.Integral) else None
+        self.add(generator, points, seed = seed, min_relative_dist = min_relative_dist)
+        return points
@@ -0,0 +1,102 @@
+from __future__ import division
+import numpy as np
+import math
+import poisson
+from mpl_toolkits.mplot3d import Axes3D
+
+# plot of a point set that is built once per pattern type: domain guides are drawn when the axes are created and
+# update() only swaps the data of the point artists, so streaming partial sets or moving the highlight slider does not
+# rebuild the figure. The first highlight_first points are green, the rest red and periodic or rotated copies blue.
+class PointSetPlot:
+    def __init__(self, generator, fig):
+        if generator.num_dim > 3:
+            raise ValueError('only 1, 2 and 3 dimensional sets can be plotted, not %d' % generator.num_dim)
+        self.generator = generator
+        self.fig = fig
+        self.num_dim = generator.num_dim
+        if self.num_dim == 3:
+            self.ax = fig.add_subplot(111, projection='3d')
+            self.draw_guides_3d()
+            # the copies are the bulk of a repeated box, depth shading them costs more than drawing them
+            self.copies = self.ax.scatter([], [], [], c='b', depthshade = False)
+            self.rest = self.ax.scatter([], [], [], c='r')
+            self.highlighted = self.ax.scatter([], [], [], c='g')
+        else:
+            self.ax = fig.add_subplot(111)
+            self.draw_guides_2d()
+            self.copies, = self.ax.plot([], [], 'bo')
+            self.rest, = self.ax.plot([], [], 'ro')
+            self.highlighted, = self.ax.plot([], [], 'go')
+        # the caller's object behind the current copies, reshaping makes a new one on every update
+        self.source = None
+
+    def draw_guides_3d(self):
+        ax = self.ax
+        if self.generator.disk == True:
+            theta, phi = np.meshgrid(np.linspace(0, 2.0 * math.pi, 30), np.arccos(np.linspace(-1, 1.0, 30)))
+            ax.plot_wireframe(np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi))
+            limits = (-1, 1)
+        elif self.generator.repeatPattern == True:
+            a, b = np.meshgrid(np.linspace(0, 2.0, 3), np.linspace(0, 2.0, 3))
+            one = np.ones_like(a)
+            ax.plot_wireframe(a, b, one)
+            ax.plot_wireframe(a, one, b)
+            ax.plot_wireframe(one, a, b)
+            limits = (0, 2)
+        else:
+            limits = (0, 1)
+        ax.set_xlim(*limits)
+        ax.set_ylim(*limits)
+        ax.set_zlim(*limits)
+
+    def draw_guides_2d(self):
+        ax = self.ax
+        if self.num_dim == 2 and self.generator.disk == True:
+            param = np.linspace(0, 2.0 * math.pi, 1000)
+            ax.plot(np.cos(param), np.sin(param), 'b-')
+            limits = (-1.1, 1.1)
+        elif self.num_dim == 2:
+            ax.plot([0, 2], [1, 1], 'k')
+            ax.plot([1, 1], [0, 2], 'k')
+            limits = (-0.05, 2.05 if self.generator.repeatPattern else 1.05)
+        else:
+            limits = (-0.05, 2.05 if self.generator.repeatPattern else 1.05)
+            ax.set_yticks([])
+        ax.set_xlim(*limits)
+        if self.num_dim == 2:
+            ax.set_ylim(*limits)
+            ax.set_aspect('equal')
+
+    # periodic copies in the other quadrants/octants of the [0, 2] plot, or the rotated copies of a disk pattern
+    def copies_of(self, points):
+        if self.generator.rotations > 1:
+            return poisson.rotated_copies(points, self.generator.rotations)[len(points):]
+        if self.generator.repeatPattern:
+            offsets = np.array([offset for offset in np.ndindex(*(2,) * self.num_dim) if any(offset)], dtype = float)
+            return (points[:, np.newaxis, :] + offsets).reshape(-1, self.num_dim)
+        return points[:0]
+
+    def set_points(self, artist, points):
+        if self.num_dim == 3:
+            artist._offsets3d = (points[:, 0], points[:, 1], points[:, 2])
+        elif self.num_dim == 2:
+            artist.set_data(points[:, 0], points[:, 1])
+        else:
+            artist.set_data(points[:, 0], np.zeros(len(points)))
+
+    def update(self, points, highlight_first = 0, redraw = True):
+        source = points
+        points = np.asarray(points).reshape(-1, self.num_dim)
+        # a slider move only changes the highlight, the copies stay
+        if source is not self.source:
+            self.set_points(self.copies, self.copies_of(points))
+            self.source = source
+        self.set_points(self.highlighted, points[:highlight_first])
+        self.set_points(self.rest, points[highlight_first:])
+        if redraw and self.fig.canvas is not None:
+            self.fig.canvas.draw_idle()
+
+def generate_ui(generator, fig, points, highlightFirst = 0):
+    plot = PointSetPlot(generator, fig)
+    plot.update(points, highlightFirst, redraw = False)
+    return plot
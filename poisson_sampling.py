@@ -0,0 +1,119 @@
+from __future__ import division
+import math
+import numpy as np
+
+# candidate samplers for PoissonGenerator.set_sampler: a stream of unit cube variates, optionally warped through the
+# inverse CDF of a density table, mapped to the pattern domain. Disk and sphere domains reject the corners of their
+# bounding box, which is cheaper than a polar warp. Everything here is picklable so restarts can run in worker processes.
+
+def random_variates(num_points, num_dim, rng):
+    return rng.random((num_points, num_dim))
+
+# generalized golden ratio sequence (Roberts' R_d) with a random toroidal shift per call, stratified within one call
+def r2_variates(num_points, num_dim, rng):
+    phi = 2.0
+    for i in range(32):
+        phi = (1.0 + phi) ** (1.0 / (num_dim + 1))
+    alpha = phi ** -np.arange(1, num_dim + 1)
+    return np.mod(rng.random(num_dim) + np.arange(1, num_points + 1)[:, np.newaxis] * alpha, 1.0)
+
+# scrambled Sobol points, drawn as the next power of two so the net stays balanced
+def sobol_variates(num_points, num_dim, rng):
+    import scipy.stats
+    seed = int(rng.random() * 2 ** 53)
+    engine = scipy.stats.qmc.Sobol(num_dim, scramble = True, seed = seed)
+    return engine.random_base2(max(0, int(num_points - 1).bit_length()))[:num_points]
+
+streams = {'random': random_variates, 'r2': r2_variates, 'sobol': sobol_variates}
+
+# piecewise constant density over the box [lower_bound, upper_bound]^num_dim, density[i0, i1, ...] is the cell i0 along
+# x, i1 along y and so on (transpose row-major images first). Unit cube variates are warped by inverting the marginal
+# CDF of x, then the CDF of y conditioned on the x cell and so on, which keeps the stratification of low discrepancy streams.
+class DensityTable:
+    def __init__(self, density, lower_bound = 0.0, upper_bound = 1.0):
+        density = np.asarray(density, dtype = float)
+        if np.any(density < 0.0) or not np.any(density > 0.0):
+            raise ValueError('density must be non-negative and not all zero')
+        self.density = density
+        self.num_dim = density.ndim
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        # mean density 1, so density-scaled distances stay comparable with uniform ones
+        self.normalized = density / np.mean(density[density > 0.0])
+
+        # per axis: cumulative distribution of every row (one row per cell of the preceding axes), offset by the row
+        # index so one searchsorted over the flat array inverts all rows at once
+        self.cdfs = []
+        for axis in range(self.num_dim):
+            marginal = density.sum(axis = tuple(range(axis + 1, self.num_dim))) if axis + 1 < self.num_dim else density
+            rows = marginal.reshape(-1, density.shape[axis])
+            totals = rows.sum(axis = 1, keepdims = True)
+            # rows without mass are never reached, uniform keeps them well defined
+            cdf = np.where(totals > 0.0, np.cumsum(rows, axis = 1) / np.where(totals > 0.0, totals, 1.0), np.arange(1, rows.shape[1] + 1) / rows.shape[1])
+            cdf[:, -1] = 1.0
+            self.cdfs.append((cdf + np.arange(len(cdf))[:, np.newaxis]).ravel())
+
+    @classmethod
+    def from_function(cls, function, num_dim, lower_bound = 0.0, upper_bound = 1.0, resolution = 64):
+        centers = lower_bound + (np.arange(resolution) + 0.5) * (upper_bound - lower_bound) / resolution
+        grid = np.stack(np.meshgrid(*[centers] * num_dim, indexing = 'ij'), axis = -1).reshape(-1, num_dim)
+        return cls(np.reshape(function(grid), (resolution,) * num_dim), lower_bound, upper_bound)
+
+    # unit cube variates (N, num_dim) to points distributed with the density
+    def warp(self, variates):
+        num_points = len(variates)
+        cells = np.zeros((num_points, self.num_dim), dtype = np.int64)
+        unit = np.zeros((num_points, self.num_dim))
+        row = np.zeros(num_points, dtype = np.int64)
+        for axis, cdf in enumerate(self.cdfs):
+            size = self.density.shape[axis]
+            u = np.minimum(variates[:, axis], np.nextafter(1.0, 0.0))
+            flat = np.minimum(np.searchsorted(cdf, row + u, side = 'right'), row * size + size - 1)
+            cell = flat - row * size
+            low = np.where(cell > 0, cdf[flat - 1] - row, 0.0)
+            high = cdf[flat] - row
+            cells[:, axis] = cell
+            unit[:, axis] = (cell + np.clip((u - low) / (high - low), 0.0, np.nextafter(1.0, 0.0))) / size
+            row = row * size + cell
+        return self.lower_bound + unit * (self.upper_bound - self.lower_bound)
+
+    # normalized density at points, mean 1 over cells with mass
+    def __call__(self, points):
+        unit = (points - self.lower_bound) / (self.upper_bound - self.lower_bound)
+        cells = np.clip(np.floor(unit * self.density.shape).astype(np.int64), 0, np.array(self.density.shape) - 1)
+        return self.normalized[tuple(cells.T)]
+
+# callable with the random_point_* signature, (num_points, rng) -> (num_points, num_dim) points
+class Sampler:
+    def __init__(self, num_dim, disk, stream = 'random', density = None):
+        if stream not in streams:
+            raise ValueError("unknown stream '%s', expected one of %s" % (stream, sorted(streams)))
+        self.num_dim = num_dim
+        self.stream = stream
+        # a 1D "disk" is the unit line, as with random_point_line
+        self.ball = disk and num_dim > 1
+        self.lower_bound = -1.0 if self.ball else 0.0
+        # 2x covers the pi/4 and pi/6 acceptance rates of the disk and sphere in one pass almost always, higher dimensional
+        # balls fill a quickly shrinking part of their box
+        self.oversampling = 2.0 if num_dim <= 3 else 1.5 * 2 ** num_dim * math.gamma(num_dim / 2.0 + 1.0) / math.pi ** (num_dim / 2.0)
+        self.density = density
+        if density is not None and density.num_dim != num_dim:
+            raise ValueError('density has %d dimensions, the pattern %d' % (density.num_dim, num_dim))
+
+    def draw(self, num_points, rng):
+        variates = streams[self.stream](num_points, self.num_dim, rng)
+        if self.density is not None:
+            return self.density.warp(variates)
+        return self.lower_bound + variates * (1.0 - self.lower_bound)
+
+    def __call__(self, num_points = 1, rng = np.random):
+        if not self.ball:
+            return self.draw(num_points, rng)
+        points = np.empty((num_points, self.num_dim))
+        num_accepted = 0
+        while num_accepted < num_points:
+            candidates = self.draw(int(self.oversampling * (num_points - num_accepted)) + 8, rng)
+            candidates = candidates[np.einsum('ij,ij->i', candidates, candidates) < 1.0][:num_points - num_accepted]
+            points[num_accepted:num_accepted + len(candidates)] = candidates
+            num_accepted += len(candidates)
+        return points
@@ -0,0 +1,263 @@
+from __future__ import print_function
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import signal
+import socket
+import sys
+import numpy as np
+import poisson
+import poisson_sampling
+
+# long-running local generation service: tools and build steps ask it for point sets instead of importing poisson and
+# generating on their own. Seeded results are kept in a warm in-memory LRU (and optionally in a find_point_set_cached
+# directory), concurrent identical requests share one generation and find_point_set runs on a process pool.
+#
+# Protocol, over a Unix socket or localhost TCP: every request is one line of JSON, {"op": "points", ...options} or
+# {"op": "stats"}. Every response is one line of JSON, followed for points by header['nbytes'] bytes of the
+# little-endian float64 (num_points, num_dim) array. Errors come back as {"error": message}. A connection can carry
+# any number of requests.
+
+# request options and their defaults, named after the PoissonGenerator and find_point_set parameters. shape is one
+# of poisson.shapes and overrides num_dim, disk and repeatPattern.
+default_options = {
+    'shape': None,
+    'num_dim': 2,
+    'disk': False,
+    'repeatPattern': True,
+    'first_point_zero': None,
+    'num_points': 8,
+    'num_iter': 4,
+    'iterations_per_point': 128,
+    'rotations': 1,
+    'sorting_buckets': [0],
+    'sorting_curve': 'rows',
+    'candidate_pool': 0,
+    'candidate_stream': 'random',
+    'spatial_index': 'auto',
+    'relax_iterations': 0,
+    'seed': None,
+}
+
+# checked and completed options, ValueError for anything generation would reject later in a worker
+def normalize_options(request):
+    unknown = set(request) - set(default_options) - {'op'}
+    if unknown:
+        raise ValueError('unknown options %s' % ', '.join(sorted(unknown)))
+    options = dict(default_options)
+    options.update((key, value) for key, value in request.items() if key != 'op')
+    if options['shape'] is not None:
+        if options['shape'] not in poisson.shapes:
+            raise ValueError("unknown shape '%s', expected one of %s" % (options['shape'], sorted(poisson.shapes)))
+        num_dim, disk, repeatPattern, allow_rotations = poisson.shapes[options['shape']]
+        options.update(num_dim = num_dim, disk = disk, repeatPattern = repeatPattern, rotations = options['rotations'] if allow_rotations else 1)
+    for key in ('num_dim', 'num_points', 'num_iter', 'iterations_per_point', 'rotations', 'candidate_pool', 'relax_iterations'):
+        options[key] = int(options[key])
+    if options['num_dim'] < 1 or options['num_points'] < 1 or options['num_iter'] < 1:
+        raise ValueError('num_dim, num_points and num_iter must be at least 1')
+    options['disk'] = bool(options['disk'])
+    options['repeatPattern'] = bool(options['repeatPattern']) and not options['disk']
+    if options['first_point_zero'] is None:
+        options['first_point_zero'] = options['disk']
+    options['sorting_buckets'] = [int(buckets) for buckets in np.atleast_1d(options['sorting_buckets'])]
+    if options['sorting_curve'] not in poisson.sort_curves:
+        raise ValueError("unknown sorting curve '%s', expected one of %s" % (options['sorting_curve'], sorted(poisson.sort_curves)))
+    if options['candidate_stream'] not in poisson_sampling.streams:
+        raise ValueError("unknown candidate stream '%s', expected one of %s" % (options['candidate_stream'], sorted(poisson_sampling.streams)))
+    if options['spatial_index'] not in poisson.spatial_indices and options['spatial_index'] != 'auto':
+        raise ValueError("unknown spatial index '%s', expected one of %s" % (options['spatial_index'], sorted(poisson.spatial_indices) + ['auto']))
+    if options['seed'] is not None:
+        options['seed'] = int(options['seed'])
+    return options
+
+# everything that changes the generated set; the spatial index only changes the speed
+def request_key(options):
+    return tuple((key, tuple(value) if isinstance(value, list) else value) for key, value in sorted(options.items())
+        if key not in ('shape', 'spatial_index'))
+
+# runs in a worker process, returns (points, quality)
+def generate(options, cache_dir = None):
+    generator = poisson.PoissonGenerator(options['num_dim'], options['disk'], options['repeatPattern'], options['first_point_zero'],
+        options['spatial_index'], options['seed'])
+    if options['candidate_stream'] != 'random':
+        generator.set_sampler(options['candidate_stream'])
+    if cache_dir:
+        points = generator.find_point_set_cached(cache_dir, options['num_points'], options['num_iter'], options['iterations_per_point'],
+            options['rotations'], options['sorting_buckets'], candidate_pool = options['candidate_pool'], sorting_curve = options['sorting_curve'],
+            relax_iterations = options['relax_iterations'])
+    else:
+        points = generator.find_point_set(options['num_points'], options['num_iter'], options['iterations_per_point'], options['rotations'],
+            candidate_pool = options['candidate_pool'], relax_iterations = options['relax_iterations'])
+        points = generator.cache_sort(points, options['sorting_buckets'], options['sorting_curve'])
+    return np.ascontiguousarray(points, dtype = '<f8'), float(generator.set_quality(points))
+
+class PoissonService:
+    def __init__(self, workers = None, cache_bytes = 256 << 20, cache_dir = None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers = workers)
+        self.cache_bytes = cache_bytes
+        self.cache_dir = cache_dir
+        # key: (points, quality), least recently used first
+        self.cache = collections.OrderedDict()
+        self.cached_bytes = 0
+        # key: future of a generation in flight, shared by every request that arrives while it runs
+        self.pending = {}
+        self.counters = collections.Counter()
+
+    def remember(self, key, result):
+        points = result[0]
+        points.flags.writeable = False
+        if points.nbytes > self.cache_bytes:
+            return
+        self.cache[key] = result
+        self.cached_bytes += points.nbytes
+        while self.cached_bytes > self.cache_bytes:
+            evicted = self.cache.popitem(last = False)[1]
+            self.cached_bytes -= evicted[0].nbytes
+            self.counters['evicted'] += 1
+
+    # (points, quality, how) where how is 'cached', 'coalesced' or 'generated'
+    async def points(self, options):
+        if options['seed'] is None:
+            # forked workers share the parent's global random state, so unseeded requests get a fresh seed and are not kept
+            options = dict(options, seed = int(np.random.SeedSequence().generate_state(1)[0]))
+            self.counters['generated'] += 1
+            return await asyncio.get_running_loop().run_in_executor(self.executor, generate, options) + ('generated',)
+        key = request_key(options)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters['cached'] += 1
+            return self.cache[key] + ('cached',)
+        if key in self.pending:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self.pending[key]) + ('coalesced',)
+        self.counters['generated'] += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, generate, options, self.cache_dir)
+        self.pending[key] = future
+        # the result is kept even if the client that asked first has disconnected
+        future.add_done_callback(lambda future: self.finish(key, future))
+        return await asyncio.shield(future) + ('generated',)
+
+    def finish(self, key, future):
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.remember(key, future.result())
+
+    def stats(self):
+        return dict(self.counters, cache_entries = len(self.cache), cache_bytes = self.cached_bytes, pending = len(self.pending))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                payload = b''
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    op = request.get('op', 'points')
+                    if op == 'stats':
+                        header = self.stats()
+                    elif op == 'points':
+                        points, quality, how = await self.points(normalize_options(request))
+                        payload = points.tobytes()
+                        header = {'shape': list(points.shape), 'dtype': points.dtype.str, 'nbytes': len(payload), 'quality': quality, 'how': how}
+                    else:
+                        raise ValueError("unknown op '%s', expected points or stats" % op)
+                except Exception as error:
+                    header, payload = {'error': '%s: %s' % (type(error).__name__, error)}, b''
+                writer.write(json.dumps(header).encode('utf-8') + b'\n' + payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # address is a Unix socket path or a (host, port) pair
+    async def serve(self, address):
+        if isinstance(address, str):
+            if os.path.exists(address):
+                # only a stale socket left by a crashed service is replaced, never one a running service listens on
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(address)
+                except ConnectionRefusedError:
+                    os.remove(address)
+                except FileNotFoundError:
+                    pass
+                else:
+                    raise RuntimeError('%s is in use by a running service' % address)
+                finally:
+                    probe.close()
+            server = await asyncio.start_unix_server(self.handle, address)
+        else:
+            server = await asyncio.start_server(self.handle, address[0], address[1])
+        # SIGTERM, as sent by service managers and build scripts, shuts down like Ctrl-C: serve_forever is cancelled and
+        # the workers and the socket file are cleaned up below
+        loop = asyncio.get_running_loop()
+        serving = asyncio.ensure_future(server.serve_forever())
+        loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+        try:
+            async with server:
+                await serving
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            self.executor.shutdown(wait = False, cancel_futures = True)
+            if isinstance(address, str) and os.path.exists(address):
+                os.remove(address)
+
+# "host:port", ":port" for localhost, or a Unix socket path
+def parse_address(spec):
+    host, separator, port = spec.rpartition(':')
+    if separator and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return spec
+
+# blocking client, one request per call: the decoded header and the payload bytes
+def request(address, message, timeout = None):
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(address)
+    else:
+        connection = socket.create_connection(address, timeout = timeout)
+    with connection, connection.makefile('rb') as stream:
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        header = json.loads(stream.readline().decode('utf-8'))
+        if 'error' in header:
+            raise RuntimeError('poisson service: ' + header['error'])
+        payload = stream.read(header.get('nbytes', 0))
+    return header, payload
+
+# (num_points, num_dim) array generated or served from cache, options as in default_options
+def request_points(address, timeout = None, **options):
+    header, payload = request(address, dict(options, op = 'points'), timeout)
+    return np.frombuffer(payload, dtype = header['dtype']).reshape(header['shape'])
+
+def service_stats(address, timeout = None):
+    return request(address, {'op': 'stats'}, timeout)[0]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = 'Serve PoissonGenerator point sets to local clients from a warm cache.')
+    parser.add_argument('address', type = parse_address, help = 'Unix socket path, or host:port / :port for TCP (localhost by default)')
+    parser.add_argument('--workers', type = int, default = os.cpu_count() or 1, help = 'processes generating point sets')
+    parser.add_argument('--cache-mb', type = float, default = 256, help = 'memory kept for recently used seeded sets')
+    parser.add_argument('--cache-dir', help = 'also keep seeded sets on disk, shared with main.py --cache-dir')
+    return parser.parse_args(argv)
+
+def main(argv = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    service = PoissonService(args.workers, int(args.cache_mb * (1 << 20)), args.cache_dir)
+    try:
+        asyncio.run(service.serve(args.address))
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as error:
+        sys.exit('poisson service: %s' % error)
+
+if __name__ == '__main__':
+    main()